@@ -0,0 +1,203 @@
+"""
+Rendering benchmarks.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_render.py
+"""
+import html
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fnl  # noqa: E402
+import fnl.entities as e  # noqa: E402
+from fnl.definitions import NO_BREAK  # noqa: E402
+
+
+def nested_lists(depth: int, width: int) -> e.HtmlRender:
+    """`depth` levels of <ul><li>, each with `width` leaves"""
+    tree: e.HtmlRender = e.SafeHtml("leaf")
+    for _ in range(depth):
+        items = [e.HtmlTag("li", "", [e.SafeHtml("item")]) for _ in range(width)]
+        tree = e.HtmlTag("ul", 'class="nested"', [*items, e.HtmlTag("li", "", [tree])])
+    return tree
+
+
+def recursive_parts(render: e.HtmlRender) -> Iterator[str]:
+    """The nested-generator serializer that `_Serializer` replaced, for comparison"""
+    if isinstance(render, e.HtmlTag):
+        yield f"<{render.tag} {render.options}>" if render.options else f"<{render.tag}>"
+        for child in render.content:
+            yield from recursive_parts(child)
+        yield f"</{render.tag}>"
+    elif isinstance(render, e.Concat):
+        for child in render.children:
+            yield from recursive_parts(child)
+    else:
+        yield from render._text_parts()
+
+
+def chained_parts(render: e.HtmlRender, after_escape=lambda s: s) -> Iterator[str]:
+    """
+    The serializer before `TextTransform`s, for comparison: recursive
+    generators, with every `nobr` adding a lambda to the chain applied to the
+    escaped text
+    """
+    if isinstance(render, e.HtmlTag):
+        yield f"<{render.tag} {render.options}>" if render.options else f"<{render.tag}>"
+        for child in render.content:
+            yield from chained_parts(child, after_escape)
+        yield f"</{render.tag}>"
+    elif isinstance(render, e.Concat):
+        for child in render.children:
+            yield from chained_parts(child, after_escape)
+    elif isinstance(render, e.Transformed):
+        inner = render.transform
+        yield from chained_parts(render.content, lambda s: after_escape(inner(s)))
+    elif isinstance(render, e.SafeHtml):
+        yield after_escape(html.escape(render.unsafe_content, quote=True))
+    else:
+        yield from render._text_parts()
+
+
+def bench(name: str, fn, number: int):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{name:50} {seconds * 1000:9.3f} ms")
+    return seconds
+
+
+def bench_serializer():
+    print("== Serializing nested lists ==")
+    for depth in (10, 100, 400):
+        tree = nested_lists(depth, width=3)
+        assert "".join(recursive_parts(tree)) == tree.as_text()
+        old = bench(
+            f"recursive generators, depth={depth}",
+            lambda: "".join(recursive_parts(tree)),
+            20,
+        )
+        new = bench(f"explicit stack, depth={depth}", tree.as_text, 20)
+        print(f"{'speedup':50} {old / new:9.2f}x")
+
+
+def bench_text_transforms():
+    texts = [f"word {i} and <tag {i}> & more" if i % 4 == 0 else f"word{i}" for i in range(10_000)]
+    for depth in (1, 3, 10):
+        print(f"== Escaping text under {depth} nested `nobr`s ==")
+
+        def chained():
+            # what `SafeHtml.fmap` used to build: escape, then a chain of lambdas
+            fn = lambda s: s  # noqa: E731
+            for _ in range(depth):
+                fn = (lambda previous: lambda s: previous(s).replace(" ", "&nbsp;"))(fn)
+            return [fn(html.escape(t, quote=True)) for t in texts]
+
+        transform = e.IDENTITY
+        for _ in range(depth):
+            transform = NO_BREAK.then(transform)
+
+        def fused():
+            # what the serializer does: escape, then the composed transform
+            return [transform(html.escape(t)) for t in texts]
+
+        assert chained() == fused()
+        old = bench("html.escape + lambda chain", chained, 20)
+        new = bench("html.escape + fused TextTransform", fused, 20)
+        print(f"{'speedup':50} {old / new:9.2f}x")
+
+    print("== Escaping text without a transform ==")
+    serialized = e.Concat([e.SafeHtml(t) for t in texts])
+    assert "".join(chained_parts(serialized)) == serialized.as_text()
+    old = bench(
+        "recursive generators + html.escape",
+        lambda: "".join(chained_parts(serialized)),
+        20,
+    )
+    new = bench("serializer", serialized.as_text, 20)
+    print(f"{'speedup':50} {old / new:9.2f}x")
+
+    print("== Rendering a large document with nested `mono` ==")
+    source = "($ " + " ".join(
+        f'(p "paragraph {i} " (nobr (it "x y " (mono "a b c" (bf "d e")))))'
+        for i in range(2_000)
+    ) + ")"
+    runtime = {**fnl.definitions.BUILTINS}
+    tree = fnl.parse(source).evaluate(runtime).render(runtime)
+    assert "".join(chained_parts(tree)) == tree.as_text() == fnl.html(source)
+    old = bench("recursive generators + lambda chain", lambda: "".join(chained_parts(tree)), 5)
+    new = bench("serializer + TextTransform", tree.as_text, 5)
+    print(f"{'speedup':50} {old / new:9.2f}x")
+
+
+def peak_memory(fn) -> int:
+    """Peak memory allocated while running `fn`, in bytes"""
+    tracemalloc.start()
+    fn()
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def bench_fused_render():
+    print("== Rendering an evaluated document ==")
+    source = "($ " + " ".join(
+        f'(p "paragraph {i} " (it "x y " (bf "a b c") (tt "d e")) (list-unordered "1" "2" "3"))'
+        for i in range(2_000)
+    ) + ")"
+    runtime = {**fnl.definitions.BUILTINS}
+    expr = fnl.parse(source).evaluate(runtime)
+
+    def via_tree():
+        return expr.render(runtime).as_text()
+
+    def fused():
+        return e.EntityRender(expr, runtime).as_text()
+
+    assert via_tree() == fused()
+    old = bench("HtmlRender tree, then text", via_tree, 5)
+    new = bench("fused EntityRender", fused, 5)
+    print(f"{'speedup':50} {old / new:9.2f}x")
+
+    old_peak = peak_memory(via_tree) / 1024 / 1024
+    new_peak = peak_memory(fused) / 1024 / 1024
+    print(f"{'peak memory: HtmlRender tree, then text':50} {old_peak:9.3f} MiB")
+    print(f"{'peak memory: fused EntityRender':50} {new_peak:9.3f} MiB")
+
+
+def bench_fnlx_options():
+    print("== Evaluating an fnl.x layout ==")
+    from fnl import fnlx
+    source = "($ " + " ".join(
+        f'(b&div &.card &.card--wide &#card{i % 10} &(data-kind "note") (i&span &.label "{i}"))'
+        for i in range(2_000)
+    ) + ")"
+    runtime = {**fnl.definitions.BUILTINS, **fnl.x}
+    tree = fnl.parse(source)
+    cached_parse = fnlx._parse_options
+
+    def uncached():
+        fnlx._parse_options = fnlx._parse_options_uncached
+        try:
+            return tree.evaluate(runtime)
+        finally:
+            fnlx._parse_options = cached_parse
+
+    def cached():
+        return tree.evaluate(runtime)
+
+    assert uncached().render(runtime).as_text() == cached().render(runtime).as_text()
+    old = bench("options parsed for every tag", uncached, 5)
+    new = bench("options cached", cached, 5)
+    print(f"{'speedup':50} {old / new:9.2f}x")
+
+
+if __name__ == "__main__":
+    bench_serializer()
+    bench_text_transforms()
+    bench_fused_render()
+    bench_fnlx_options()
@@ -1,18 +1,46 @@
 import re
 import json  # json is needed to decode a string
+import importlib
+import io
+from contextlib import contextmanager, nullcontext
 from textwrap import dedent
-from typing import Iterable, Tuple, Mapping, Union
+from typing import (
+    IO, TYPE_CHECKING, Any, ContextManager, Iterable, Iterator, Tuple, Mapping, Optional, Union,
+)
 from lark import Lark, Transformer, v_args
 
-from . import patma_utils as _patma_utils  # imported for the side effects
-
 from . import entities as e
 from . import entity_types as et
 from . import definitions
-from .bindings import bindings
 from . import type_parser
-from . import fnlx as _fnlx
-x = _fnlx.exports
+from .bindings import bindings
+
+if TYPE_CHECKING:
+    import hashlib
+    import socket
+    from .disk_cache import DiskCache
+    from .profile import Profile
+    from .render_cache import RenderCache
+
+
+# Rarely used parts of `fnl` are loaded on first access, see `__getattr__`
+_LAZY_SUBMODULES = frozenset((
+    "fnlx", "docs", "patma_utils", "fingerprint", "render_cache", "etag",
+    "html_diff", "profile", "disk_cache",
+))
+
+
+def __getattr__(name: str):
+    if name == "parser":
+        value = _get_parser()
+    elif name == "x":
+        from .fnlx import exports as value
+    elif name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
 
 @v_args(inline=True)
@@ -40,36 +68,208 @@ class LanguageTransformer(Transformer):
     quoted = e.Quoted
 
 
-parser = Lark.open(
-    "fnl.lark",
-    rel_to=__file__,
-    parser="lalr",
-    transformer=LanguageTransformer(),
-    propagate_positions=True,
-)
+_parser: Optional[Lark] = None
+
+
+def _get_parser() -> Lark:
+    global _parser
+    if _parser is None:
+        _parser = Lark.open(
+            "fnl.lark",
+            rel_to=__file__,
+            parser="lalr",
+            transformer=LanguageTransformer(),
+            propagate_positions=True,
+        )
+    return _parser
 
 
 def parse(source: str) -> e.Entity:
-    return parser.parse(source)  # type: ignore
+    return _get_parser().parse(source)  # type: ignore
 
 
 class FnlTypeError(TypeError):
     pass
 
 
-def html(
-        source: str,
-        extensions: Union[Iterable[Tuple[str, e.Entity]], Mapping[str, e.Entity]] = ()
-) -> str:
+@contextmanager
+def _fnl_errors() -> Iterator[None]:
+    """
+    Raise the errors in FNL code as `FnlTypeError`. They can happen while
+    evaluating the source or while serializing the result, e.g. in a `foreach`
+    or an extension that evaluates expressions while it's being rendered.
+    """
+    try:
+        yield
+    except e.CallError as call_error:
+        # raise the exception without the internal traceback:
+        raise FnlTypeError(call_error.msg) from None
+
+
+def _translated(chunks: Iterator[Any]) -> Iterator[Any]:
+    with _fnl_errors():
+        yield from chunks
+
+
+Extensions = Union[Iterable[Tuple[str, e.Entity]], Mapping[str, e.Entity]]
+
+
+Source = Union[str, e.Entity]
+
+
+def _render_tree(
+        source: Source,
+        extensions: Extensions,
+        cache: Optional["RenderCache"],
+        profile: Optional["Profile"] = None,
+) -> e.HtmlRender:
     runtime = {**definitions.BUILTINS}
     runtime.update(extensions)  # type: ignore -- Pyright, issue 1119
 
-    error = None
-    try:
-        expr = parse(source).evaluate(runtime)
-        return expr.render(runtime).as_text()
-    except e.CallError as call_error:
-        error = call_error.msg
+    with _fnl_errors():
+        with _phase(profile, "parse"):
+            parsed = parse(source) if isinstance(source, str) else source
+        with _phase(profile, "evaluate"):
+            expr = parsed.evaluate(runtime)
+        if profile is not None:
+            from .profile import count_nodes
+            profile.nodes += count_nodes(expr)
+        if cache is None:
+            # serialized directly, without building an HtmlRender tree
+            return e.EntityRender(expr, runtime)
+        with _phase(profile, "render"):
+            return cache.render(expr, runtime)
+
+
+def _phase(profile: Optional["Profile"], name: str) -> ContextManager[None]:
+    return nullcontext() if profile is None else profile.phase(name)
+
+
+def html(
+        source: Source,
+        extensions: Extensions = (),
+        cache: Optional["RenderCache"] = None,
+        profile: Optional["Profile"] = None,
+        disk_cache: Optional["DiskCache"] = None,
+) -> str:
+    """
+    Render `source` as HTML. `source` can also be an expression parsed
+    beforehand with `parse`, so that it can be rendered many times.
+
+    Rendered fragments are looked up in and saved to the `cache`, if any.
+    If a `profile` is given, the time spent in each phase is added to it,
+    see `fnl.profile`.
+
+    Whole pages are looked up in and saved to the `disk_cache`, if any: on a
+    hit, `source` isn't even parsed. See `fnl.disk_cache`.
+    """
+    if disk_cache is not None:
+        runtime = {**definitions.BUILTINS}
+        runtime.update(extensions)  # type: ignore -- Pyright, issue 1119
+        with _phase(profile, "disk cache"):
+            key = disk_cache.key(source, runtime)
+            text = None if key is None else disk_cache.get(key)
+        if text is not None:
+            if profile is not None:
+                profile.disk_cache_hits += 1
+                profile.count_output(text)
+            return text
+        text = html(source, runtime, cache, profile)
+        if key is not None:
+            disk_cache.put(key, text)
+        return text
+
+    tree = _render_tree(source, extensions, cache, profile)
+    # the evaluated entities are rendered while they're serialized
+    with _phase(profile, "render"), _fnl_errors():
+        text = tree.as_text()
+    if profile is not None:
+        profile.count_output(text)
+    return text
+
+
+def html_utf8(
+        source: Source,
+        extensions: Extensions = (),
+        cache: Optional["RenderCache"] = None,
+) -> bytearray:
+    """
+    Render `source` as UTF-8 encoded HTML, written straight into a byte
+    buffer instead of building a `str` and encoding it afterwards.
+    """
+    buffer = bytearray()
+    tree = _render_tree(source, extensions, cache)
+    with _fnl_errors():
+        tree.write_utf8(buffer)
+    return buffer
+
+
+def iter_html(
+        source: Source,
+        extensions: Extensions = (),
+        chunk_size: int = io.DEFAULT_BUFFER_SIZE,
+        cache: Optional["RenderCache"] = None,
+) -> Iterator[str]:
+    """
+    Render `source` as HTML in chunks of about `chunk_size` characters.
+
+    The source is evaluated before this function returns, so most type errors
+    are raised here. Those in parts that are evaluated while they're being
+    serialized (e.g. the elements of `foreach`) are raised as `FnlTypeError`
+    in the middle of the iteration. The result can be used as a chunked HTTP
+    response body.
+    """
+    return _translated(_render_tree(source, extensions, cache).chunks(chunk_size))
+
+
+def iter_html_utf8(
+        source: Source,
+        extensions: Extensions = (),
+        chunk_size: int = io.DEFAULT_BUFFER_SIZE,
+        cache: Optional["RenderCache"] = None,
+) -> Iterator[bytearray]:
+    """
+    Same as `iter_html`, but the chunks are UTF-8 encoded. Wrap the result in
+    `fnl.etag.ETagStream` to compute the ETag along the way.
+    """
+    return _translated(_render_tree(source, extensions, cache).utf8_chunks(chunk_size))
+
+
+def render_to(
+        source: Source,
+        writable: Union[IO[str], IO[bytes], "socket.socket"],
+        extensions: Extensions = (),
+        buffer_size: int = io.DEFAULT_BUFFER_SIZE,
+        cache: Optional["RenderCache"] = None,
+        hasher: Optional["hashlib._Hash"] = None,
+) -> int:
+    """
+    Render `source` as HTML into a file or a socket, `buffer_size`
+    characters (or bytes) at a time. Returns the number of characters (for
+    text files) or bytes (otherwise) written.
+
+    Text files (`io.TextIOBase`) receive `str`, sockets and all other files
+    receive UTF-8 encoded `bytes`.
+
+    If a `hasher` (e.g. `hashlib.sha256()`) is given, it's updated with the
+    UTF-8 encoded output as it's written, see `fnl.etag`.
+    """
+    tree = _render_tree(source, extensions, cache)
+    written = 0
+    if isinstance(writable, io.TextIOBase):
+        for chunk in _translated(tree.chunks(buffer_size)):
+            writable.write(chunk)
+            written += len(chunk)
+            if hasher is not None:
+                hasher.update(chunk.encode("utf-8"))
+        return written
 
-    # raise the exception without the internal traceback:
-    raise FnlTypeError(error)
+    # sockets have `sendall`, files have `write`: `socket` isn't imported just
+    # to tell them apart
+    send = getattr(writable, "sendall", None) or writable.write
+    for data in _translated(tree.utf8_chunks(buffer_size)):
+        send(data)  # type: ignore
+        written += len(data)
+        if hasher is not None:
+            hasher.update(data)
+    return written
@@ -1,9 +1,126 @@
-from dataclasses import dataclass
-from typing import Callable, Dict, Optional, Any
+from collections import abc
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union, Any
 from fnl.type_parser import parse_fn
-from . import e
+from . import e, et
 from .definitions import fn
-from context_manager_patma import match
+from .patterns import compile_pattern
+
+
+# The functions of this module are built once, at import time. The only
+# state is the `Scope` object, which lives in the runtime under this key.
+# It's not a valid FNL name, so it can't be shadowed from FNL code.
+SCOPE_KEY = "(bindings scope)"
+
+
+class Thunk:
+    """
+    An expression bound by `let` or `foreach` that wasn't needed yet. It's
+    evaluated on the first lookup, in the frame enclosing the binding, and
+    then replaced with its value, so it's evaluated at most once.
+    """
+    __slots__ = ("expr",)
+
+    def __init__(self, expr: e.Entity):
+        self.expr = expr
+
+
+class Frame:
+    """
+    The bindings of one `let` or of one element of `foreach`, linked to the
+    frame it's nested in. Frames are never unlinked or renamed after they're
+    created (only their thunks are replaced with values), so a nested frame
+    can keep referring to its parents.
+    """
+    __slots__ = ("names", "values", "parent")
+
+    def __init__(
+            self,
+            names: Tuple[str, ...],
+            values: List[Union[e.Entity, Thunk]],
+            parent: Optional["Frame"],
+    ):
+        self.names = names
+        self.values = values
+        self.parent = parent
+
+
+@dataclass(eq=False)
+class Scope(e.Entity):
+    """
+    State of the 'bindings' module. The current frame is kept in a context
+    variable, so one runtime can render many pages at once in different
+    threads (or asyncio tasks): each of them sees its own frame.
+    """
+    @property
+    def frame(self) -> Optional[Frame]:
+        return _frames.get().get(self)
+
+    @frame.setter
+    def frame(self, frame: Optional[Frame]):
+        # copied, not changed in place: the copies of a context share it
+        frames = dict(_frames.get())
+        if frame is None:
+            frames.pop(self, None)
+        else:
+            frames[self] = frame
+        _frames.set(frames)
+
+    def get_name(self, name: str, runtime) -> Optional[e.Entity]:
+        frame = self.frame
+        while frame is not None:
+            names = frame.names
+            for i in range(len(names) - 1, -1, -1):
+                if names[i] == name:
+                    return self._force(frame, i, runtime)
+            frame = frame.parent
+        return None
+
+    def get_slot(self, depth: int, index: int, name: str, runtime) -> Optional[e.Entity]:
+        """
+        Look up a binding resolved by `analyze`. If the frames aren't what the
+        analysis expected (e.g. `var` was called from an escaped quoted
+        expression), fall back to looking the name up.
+        """
+        frame = self.frame
+        for _ in range(depth):
+            if frame is None:
+                break
+            frame = frame.parent
+        if frame is not None and index < len(frame.names) and frame.names[index] == name:
+            return self._force(frame, index, runtime)
+        return self.get_name(name, runtime)
+
+    def _force(self, frame: Frame, index: int, runtime) -> e.Entity:
+        value = frame.values[index]
+        if not isinstance(value, Thunk):
+            return value
+        saved_frame = self.frame
+        self.frame = frame.parent
+        try:
+            result = value.expr.evaluate(runtime)
+        finally:
+            self.frame = saved_frame
+        frame.values[index] = result
+        return result
+
+    def push(self, names: Tuple[str, ...], exprs: Sequence[e.Entity]):
+        # the expressions are evaluated when (and if) they're looked up
+        self.frame = Frame(names, [Thunk(expr) for expr in exprs], self.frame)
+
+    def pop(self):
+        assert self.frame is not None
+        self.frame = self.frame.parent
+
+
+# The current frame of each `Scope` that is in use. Context variables are
+# never freed, so there's one for all the scopes rather than one per scope.
+_frames: "ContextVar[Dict[Scope, Frame]]" = ContextVar("fnl.bindings frames", default={})
+
+
+def _scope(runtime) -> Scope:
+    return runtime[SCOPE_KEY]
 
 
 @dataclass
@@ -14,9 +131,11 @@ class EvaluateInContext(e.Entity):
 
     def evaluate(self, runtime) -> e.Entity:
         self.before_evaluation(runtime)
-        result = self.subexpression.evaluate(runtime)
-        self.after_evaluation(runtime)
-        return result
+        try:
+            return self.subexpression.evaluate(runtime)
+        finally:
+            # even after an error, so that the next render starts clean
+            self.after_evaluation(runtime)
 
 
 @dataclass
@@ -27,189 +146,432 @@ class RuntimeDependent(e.Entity):
         return self.getter(runtime).evaluate(runtime)
 
 
-def bindings() -> Dict[str, e.Entity]:
-    extensions = {}
+@dataclass
+class LazyForeach(e.Entity):
+    """
+    The result of `foreach`. The body is evaluated for one element at a
+    time, while the result is being serialized, so only one element is held
+    in memory no matter how long the sequence is.
+
+    The body is evaluated in the frame where `foreach` was called, so a
+    nested `foreach` can still see the bindings of the outer one.
+    """
+    names: Tuple[str, ...]
+    elements: Sequence[e.Entity]
+    body: e.Entity
+    frame: Optional[Frame]
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def evaluate_element(self, index: int, runtime) -> e.Entity:
+        element = self.elements[index]
+        scope = _scope(runtime)
+        saved_frame = scope.frame
+        scope.frame = self.frame
+        try:
+            scope.push(self.names, (element,))
+            return self.body.evaluate(runtime)
+        finally:
+            scope.frame = saved_frame
+
+    def inline_element(self, index: int, runtime) -> e.Entity:
+        element = self.evaluate_element(index, runtime)
+        if not _INLINE.match(element):
+            # the same error as passing the element to `$` or `bf` directly
+            raise e.CallError(
+                f"Cannot call {_INLINE_FN.signature()} with ({element.ty.signature()})",
+                propagate=False,
+            )
+        return element
 
-    parent_loops = []
-    bindings = {}
+    # the kind of the elements isn't known until they're evaluated, so
+    # `foreach` returns `any`, which can be rendered both ways. If it's
+    # rendered inline, each element is checked to be inline:
 
-    def get_name(name: str) -> Optional[e.Entity]:
-        if name in bindings:
-            return bindings[name]
+    def render_inline(self, runtime) -> e.HtmlRender:
+        return e.Concat([
+            self.inline_element(i, runtime).render_inline(runtime)  # type: ignore
+            for i in range(len(self))
+        ])
 
-        for parent_bindings in reversed(parent_loops):
-            if name in parent_bindings:
-                return parent_bindings[name]
+    def render_block(self, runtime) -> e.HtmlRender:
+        return e.Concat([
+            self.evaluate_element(i, runtime).render(runtime)
+            for i in range(len(self))
+        ])
 
-        return None
+    def _unfold(self, serializer: e._Serializer) -> e.Piece:
+        serializer.stack.append(_ForeachCursor(self, 0, serializer.inline))
+        return ""
 
-    def push_subscope_with(new_scope):
-        def push_subscope(runtime):
-            nonlocal bindings
-            parent_loops.append(bindings)
-            bindings = {
-                name: expr.evaluate(runtime)
-                for name, expr in new_scope.items()
-            }
-        return push_subscope
-
-    def pop_subscope(_runtime):
-        nonlocal bindings
-        bindings = parent_loops.pop()
-
-    @fn(extensions, "var")
-    def var():
-        """
-        Part of the 'bindings' module.
 
-        %%(tt "(var &x)")%% is used to look up the binding %%(tt "x")%%
-        defined in a 'let' or 'for' clause.
-        """
-        def _var(quoted_name):
-            name = quoted_name.subexpression.name
-            if (value := get_name(name)) is not None:
-                return value
-            else:
-                raise TypeError(f"Binding {name} not found")
-        yield ("(λ &[name] . any)", _var)
+_INLINE = et.TInline()
+_INLINE_FN = parse_fn("(λ ...inline . inline)")
 
-    @fn(extensions, "let")
-    def let():
-        r"""
-        Part of the 'bindings' module.
 
-        Defines a scope in which certain bindings refer to certain expressions.
-        Examples:
-            %%(tt "(let &answer 42 &(bf (var &answer)))")%%,
-            %%(tt "((let &(answer 42) &(pi 3)) &(bf (var &answer) \"...\" (var &pi)))")%%
-        """
-        def from_many(*kv_pairs):
-            new_bindings = {}
-            for entry in kv_pairs:
-                with match(entry) as case:
-                    with case('Quoted(Sexpr(Name(name), expr))') as [m]:
-                        new_bindings[m.name] = m.expr
-
-            def _from_many(quoted_body):
-                return EvaluateInContext(
-                    push_subscope_with(new_bindings),
-                    pop_subscope,
-                    quoted_body.subexpression
-                )
-
-            return e.Function({parse_fn("(λ &[any] . any)"): _from_many})
-        yield ("(λ ...&[(name any)] . (λ &[any] . any))", from_many)
-
-        def from_one(key, value, quoted_body):
-            return EvaluateInContext(
-                push_subscope_with({key.subexpression.name: value}),
-                pop_subscope,
-                quoted_body.subexpression
-            )
-        yield ("(λ &[name] any &[any] . any)", from_one)
-
-    @fn(extensions, "bind")
-    def bind():
-        # (bind &a 1 &expr) <=> &(let &a 1 &expr)
-        def _bind(key, value, quoted_body):
-            return e.Quoted(e.Sexpr(
-                let,
-                (key, value, quoted_body)
-            ))
-        yield ("(λ &[name] any &[any] . &[any])", _bind)
-
-    @fn(extensions, "obj")
-    def obj():
-        #     (obj &(x "hello") &(y "world"))
-        # <=> &((let &(x "hello") &(y "world")) (var &@))
-        def _obj(*kv_pairs):
-            return e.Quoted(e.Sexpr(
-                e.Sexpr(let, kv_pairs),
-                (e.Sexpr(var, (e.Quoted(e.Name("@")),)),)
+class _QuotedElements(abc.Sequence):
+    """The elements `a`, `b` and `c` of `&(a b c)`, without copying them"""
+    def __init__(self, sexpr: e.Sexpr):
+        self.sexpr = sexpr
+
+    def __len__(self) -> int:
+        return 1 + len(self.sexpr.args)
+
+    def __getitem__(self, index: int) -> e.Entity:
+        return self.sexpr.fn if index == 0 else self.sexpr.args[index - 1]
+
+
+@dataclass
+class _ForeachCursor(e.HtmlRender):
+    """The next element of a `LazyForeach` on the serializer stack"""
+    foreach: LazyForeach
+    index: int
+    inline: bool
+
+    def _unfold(self, serializer: e._Serializer) -> e.Piece:
+        if self.index == len(self.foreach):
+            return ""
+        if self.inline:
+            element = self.foreach.inline_element(self.index, serializer.runtime)
+        else:
+            element = self.foreach.evaluate_element(self.index, serializer.runtime)
+        self.index += 1
+        # the element is serialized (and dropped) before the next one is evaluated
+        serializer.stack.append(self)
+        serializer.stack.append(element)
+        return ""
+
+
+def push_subscope_with(names: Tuple[str, ...], exprs: Sequence[e.Entity]):
+    def push_subscope(runtime):
+        _scope(runtime).push(names, exprs)
+    return push_subscope
+
+
+def pop_subscope(runtime):
+    _scope(runtime).pop()
+
+
+# Resolving the bindings in advance
+#
+# Before a `let` or `foreach` evaluates its body, the body is analyzed once:
+# every `(var &x)` which refers to a name bound by that form (or by the forms
+# nested in the body) is replaced with a `Slot`, which finds the binding
+# without searching for it. `foreach` analyzes the body once for all the
+# elements, and the bodies of the nested forms are marked as `Analyzed`, so
+# they aren't analyzed again on every iteration of the outer loop.
+#
+# Quoted arguments of other functions are left alone: they may be evaluated
+# anywhere, so their `var`s are looked up by name.
+
+Env = Tuple[Tuple[str, ...], ...]  # the names of the frames, innermost first
+
+
+@dataclass
+class Slot(e.Entity):
+    """`(var &name)` resolved to the `index`-th binding of the `depth`-th frame"""
+    depth: int
+    index: int
+    name: str
+    original: e.Sexpr  # the `var` call, used if `var` was redefined
+
+    def evaluate(self, runtime) -> e.Entity:
+        if self.original.fn is not var and runtime.get("var") is not var:
+            return self.original.evaluate(runtime)
+        if (value := _scope(runtime).get_slot(self.depth, self.index, self.name, runtime)) is None:
+            raise TypeError(f"Binding {self.name} not found")
+        return value.evaluate(runtime)
+
+    def as_source(self) -> str:
+        return self.original.as_source()
+
+
+@dataclass
+class Analyzed(e.Entity):
+    """The body of a binding form, already analyzed for the frame with `names`"""
+    names: Tuple[str, ...]
+    body: e.Entity
+
+    def evaluate(self, runtime) -> e.Entity:
+        return self.body.evaluate(runtime)
+
+    def as_source(self) -> str:
+        return self.body.as_source()
+
+
+def analyze_body(names: Tuple[str, ...], body: e.Entity) -> e.Entity:
+    if isinstance(body, Analyzed) and body.names == names:
+        return body.body
+    return _analyze(body, (names,))
+
+
+def _is_builtin(entity: e.Entity, name: str) -> bool:
+    return entity is exports[name] or (isinstance(entity, e.Name) and entity.name == name)
+
+
+def _analyze(expr: e.Entity, env: Env) -> e.Entity:
+    if not isinstance(expr, e.Sexpr):
+        return expr
+    fn, args = expr.fn, expr.args
+
+    if _is_builtin(fn, "var") and (m := _VAR_CALL.match(args)) is not None:
+        name = m["name"]
+        for depth, names in enumerate(env):
+            for index in range(len(names) - 1, -1, -1):
+                if names[index] == name:
+                    return Slot(depth, index, name, expr)
+        return expr
+
+    if _is_builtin(fn, "let") and (m := _LET_ONE.match(args)) is not None:
+        names = (m["name"],)
+        new_args = (args[0], _analyze(m["value"], env), _analyzed(names, m["body"], env))
+    elif _is_builtin(fn, "foreach") and (m := _FOREACH_ANY.match(args)) is not None:
+        names = (m["name"],)
+        seq = m["seq"]
+        if not isinstance(seq, e.Quoted):
+            # a `list`
+            new_seq = _analyze(seq, env)
+        elif isinstance(seq.subexpression, e.Sexpr):
+            quoted = seq.subexpression
+            elements = tuple(_analyze(element, env) for element in (quoted.fn, *quoted.args))
+            new_seq = e.Quoted(replace(quoted, fn=elements[0], args=elements[1:]))
+        else:
+            new_seq = seq
+        new_args = (args[0], new_seq, _analyzed(names, m["body"], env))
+    elif (
+        isinstance(fn, e.Sexpr) and _is_builtin(fn.fn, "let")
+        and (m := _LET_BODY.match(args)) is not None
+        and None not in (entries := [_LET_ENTRY.match(entry) for entry in fn.args])
+    ):
+        names = _frame_names(entry["name"] for entry in entries)  # type: ignore
+        new_fn = replace(fn, args=tuple(
+            e.Quoted(replace(
+                quoted.subexpression,  # type: ignore
+                args=(_analyze(entry["expr"], env),),
             ))
-        yield ("(λ ...&[(name any)] . &[any])", _obj)
+            for (quoted, entry) in zip(fn.args, entries)
+        ))
+        return replace(expr, fn=new_fn, args=(_analyzed(names, m["body"], env),))
+    else:
+        new_fn = _analyze(fn, env)
+        new_args = tuple(
+            arg if isinstance(arg, e.Quoted) else _analyze(arg, env)
+            for arg in args
+        )
+        if new_fn is fn and all(new is old for (new, old) in zip(new_args, args)):
+            return expr
+        return replace(expr, fn=new_fn, args=new_args)
+    return replace(expr, args=new_args)
 
-    @fn(extensions, "foreach")
-    def foreach():
-        r"""
-        Part of the 'bindings' module.
 
-        For each element of a 'list', render some expression while binding
-        the element to a specific name.
-        %%(tt "(foreach &i &(1 2 3 4) &($ (bf (var &i)) \" \")")%% will render
-        boldface numbers 1, 2, 3 and 4 separated by spaces.
-        """
-        def _foreach(name, seq, body):
-            with match([name, seq, body]) as case:
-                with case('Seq(Quoted(Name(name)), Quoted(Name("nil")), Quoted(body))') as [m]:
-                    name, seq, body = m.name, (), m.body
-
-                with case('Seq(Quoted(Name(name)), Quoted(seq), Quoted(body))') as [m]:
-                    name, seq, body = m.name, (m.seq.fn, *m.seq.args), m.body
-
-            results = []
-            for element in seq:
-                results.append(
-                    EvaluateInContext(
-                        push_subscope_with({name: element}),
-                        pop_subscope,
-                        body
-                    )
-                )
-            return e.Sexpr(e.Name("$"), tuple(results))
-
-        yield ("(λ &[name] &[any] &[any] . any)", _foreach)
-
-    @fn(extensions, "unquote")
-    def unquote():
-        """
-        Part of the 'bindings' module.
+def _analyzed(names: Tuple[str, ...], body: e.Entity, env: Env) -> e.Quoted:
+    return e.Quoted(Analyzed(names, _analyze(body, (names, *env))))
 
-        Extract and evaluate the expression from under the %%(tt "&")%%
-        """
-        def _unquote(quoted):
-            return quoted.subexpression
-        yield ("(λ &[any] . any)", _unquote)
 
-    @fn(extensions, "extract-name")
-    def extract_name():
-        """
-        Part of the 'bindings' module.
+def _frame_names(names: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(names))
 
-        Convert a quoted name to a string
-        """
-        def _extract_name(quoted_name):
-            return e.String(quoted_name.subexpression.name)
-        yield ("(λ &[name] . str)", _extract_name)
 
-    @fn(extensions, "documented-names")
-    def documented_names():
-        """
-        Part of the 'bindings' module.
+_VAR_CALL = compile_pattern('Seq(Quoted(Name(name)))')
+_LET_ONE = compile_pattern('Seq(Quoted(Name(name)), value, Quoted(body))')
+_LET_BODY = compile_pattern('Seq(Quoted(body))')
+_LET_ENTRY = compile_pattern('Quoted(Sexpr(Name(name), expr))')
+_FOREACH_EMPTY = compile_pattern('Seq(Quoted(Name(name)), Quoted(Name("nil")), Quoted(body))')
+_FOREACH = compile_pattern('Seq(Quoted(Name(name)), Quoted(Pi(seq, Sexpr())), Quoted(body))')
+_FOREACH_ANY = compile_pattern('Seq(Quoted(Name(name)), seq, Quoted(body))')
 
-        Get a list of all the documented names as a quoted s-expression:
-        %%(tt "&(&bf &it &tt ...)")%%
-        """
-        def _get_names(runtime: Dict[str, e.Entity]):
-            fn, *args = (
-                e.Quoted(e.Name(key)) for key, value in runtime.items()
-                if getattr(value, "_docstring_source", None) is not None
-            )
-            return e.Quoted(e.Sexpr(fn, tuple(args)))
 
-        def _documented_names():
-            return RuntimeDependent(_get_names)
-        yield ("(λ . &[any])", _documented_names)
+exports: Dict[str, e.Entity] = {}
 
-    @fn(extensions, "debug")
-    def debug():
-        """
-        Part of the 'bindings' module.
 
-        Render an expresion for debugging purposes
-        """
-        def _debug(x):
-            return e.String(x.as_source())
-        yield ("(λ any . str)", _debug)
+def bindings() -> Dict[str, e.Entity]:
+    """
+    Get the 'bindings' module as a runtime extension.
+
+    The functions are shared between calls, only the scope is created anew.
+    The result can be used by many threads at once, see `Scope`.
+    """
+    return {**exports, SCOPE_KEY: Scope()}
+
+
+@fn(exports, "var")
+def var():
+    """
+    Part of the 'bindings' module.
+
+    %%(tt "(var &x)")%% is used to look up the binding %%(tt "x")%%
+    defined in a 'let' or 'for' clause.
+    """
+    def _var(quoted_name):
+        name = quoted_name.subexpression.name
+
+        def _lookup(runtime):
+            if (value := _scope(runtime).get_name(name, runtime)) is not None:
+                return value
+            else:
+                raise TypeError(f"Binding {name} not found")
+        return RuntimeDependent(_lookup)
+    yield ("(λ &[name] . any)", _var)
+
+
+_LET_BODY_TYPE = parse_fn("(λ &[any] . any)")
+
+
+@fn(exports, "let")
+def let():
+    r"""
+    Part of the 'bindings' module.
+
+    Defines a scope in which certain bindings refer to certain expressions.
+    Examples:
+        %%(tt "(let &answer 42 &(bf (var &answer)))")%%,
+        %%(tt "((let &(answer 42) &(pi 3)) &(bf (var &answer) \"...\" (var &pi)))")%%
+
+    The expressions in the second form are evaluated when they're first
+    used, and not at all if they aren't. In the first form, the value is
+    an argument of the call, so it's evaluated right away.
+    """
+    def from_many(*kv_pairs):
+        new_bindings = {}
+        for entry in kv_pairs:
+            if (m := _LET_ENTRY.match(entry)) is not None:
+                new_bindings[m["name"]] = m["expr"]
+        names = tuple(new_bindings)
+        exprs = tuple(new_bindings.values())
+
+        def _from_many(quoted_body):
+            return EvaluateInContext(
+                push_subscope_with(names, exprs),
+                pop_subscope,
+                analyze_body(names, quoted_body.subexpression)
+            )
 
-    return extensions
+        return e.Function({_LET_BODY_TYPE: _from_many})
+    yield ("(λ ...&[(name any)] . (λ &[any] . any))", from_many)
+
+    def from_one(key, value, quoted_body):
+        names = (key.subexpression.name,)
+        return EvaluateInContext(
+            push_subscope_with(names, (value,)),
+            pop_subscope,
+            analyze_body(names, quoted_body.subexpression)
+        )
+    yield ("(λ &[name] any &[any] . any)", from_one)
+
+
+@fn(exports, "bind")
+def bind():
+    # (bind &a 1 &expr) <=> &((let &(a 1)) &expr)
+    # `value` is already evaluated, since it's an argument of `bind`
+    def _bind(key, value, quoted_body):
+        return e.Quoted(e.Sexpr(
+            e.Sexpr(let, (e.Quoted(e.Sexpr(key.subexpression, (value,))),)),
+            (quoted_body,)
+        ))
+    yield ("(λ &[name] any &[any] . &[any])", _bind)
+
+
+@fn(exports, "obj")
+def obj():
+    #     (obj &(x "hello") &(y "world"))
+    # <=> &((let &(x "hello") &(y "world")) (var &@))
+    def _obj(*kv_pairs):
+        return e.Quoted(e.Sexpr(
+            e.Sexpr(let, kv_pairs),
+            (e.Sexpr(var, (e.Quoted(e.Name("@")),)),)
+        ))
+    yield ("(λ ...&[(name any)] . &[any])", _obj)
+
+
+@fn(exports, "foreach")
+def foreach():
+    r"""
+    Part of the 'bindings' module.
+
+    For each element of a 'list', render some expression while binding
+    the element to a specific name. The elements are evaluated one by one
+    while the page is being written.
+    %%(tt "(foreach &i &(1 2 3 4) &($ (bf (var &i)) \" \")")%% will render
+    boldface numbers 1, 2, 3 and 4 separated by spaces. The elements can
+    also be a %%(tt "list")%%, e.g. %%(tt "(range 1 5)")%%.
+    """
+    def _foreach(name, seq, body):
+        if (m := _FOREACH_EMPTY.match((name, seq, body))) is not None:
+            names, elements, body = (m["name"],), (), m["body"]
+        elif (m := _FOREACH.match((name, seq, body))) is not None:
+            names, elements, body = (m["name"],), _QuotedElements(m["seq"]), m["body"]
+        else:
+            raise TypeError(f"Expected a quoted list of elements, got {seq.as_source()}")
+
+        # analyzed once for all the elements
+        body = analyze_body(names, body)
+        return RuntimeDependent(
+            lambda runtime: LazyForeach(names, elements, body, _scope(runtime).frame)
+        )
+
+    yield ("(λ &[name] &[any] &[any] . any)", _foreach)
+
+    def _foreach_list(name, lst, body):
+        names = (name.subexpression.name,)
+        body = analyze_body(names, body.subexpression)
+        return RuntimeDependent(
+            lambda runtime: LazyForeach(names, lst.items, body, _scope(runtime).frame)
+        )
+    yield ("(λ &[name] list &[any] . any)", _foreach_list)
+
+
+@fn(exports, "unquote")
+def unquote():
+    """
+    Part of the 'bindings' module.
+
+    Extract and evaluate the expression from under the %%(tt "&")%%
+    """
+    def _unquote(quoted):
+        return quoted.subexpression
+    yield ("(λ &[any] . any)", _unquote)
+
+
+@fn(exports, "extract-name")
+def extract_name():
+    """
+    Part of the 'bindings' module.
+
+    Convert a quoted name to a string
+    """
+    def _extract_name(quoted_name):
+        return e.String(quoted_name.subexpression.name)
+    yield ("(λ &[name] . str)", _extract_name)
+
+
+@fn(exports, "documented-names")
+def documented_names():
+    """
+    Part of the 'bindings' module.
+
+    Get a list of all the documented names as a quoted s-expression:
+    %%(tt "&(&bf &it &tt ...)")%%
+    """
+    def _get_names(runtime: Dict[str, e.Entity]):
+        fn, *args = (
+            e.Quoted(e.Name(key)) for key, value in runtime.items()
+            if getattr(value, "_docstring_source", None) is not None
+        )
+        return e.Quoted(e.Sexpr(fn, tuple(args)))
+
+    def _documented_names():
+        return RuntimeDependent(_get_names)
+    yield ("(λ . &[any])", _documented_names)
+
+
+@fn(exports, "debug")
+def debug():
+    """
+    Part of the 'bindings' module.
+
+    Render an expresion for debugging purposes
+    """
+    def _debug(x):
+        return e.String(x.as_source())
+    yield ("(λ any . str)", _debug)
@@ -0,0 +1,82 @@
+"""
+Prebuilt types of the built-in functions.
+
+`type_parser.parse` looks type strings up here before falling back to the
+Lark parser, so importing `fnl` doesn't need to build the type grammar.
+`tests/test_type_parser.py` checks that every entry is equal to what the
+parser would produce.
+"""
+from typing import Dict, Optional, Sequence
+from . import entity_types as et
+
+
+def _fn(
+        arg_types: Sequence[et.EntityType],
+        rest_type: Optional[et.EntityType],
+        return_type: et.EntityType
+) -> et.TFunction:
+    return et.TFunction(tuple(arg_types), rest_type, return_type)
+
+
+def _union(*variants: et.EntityType) -> et.TUnion:
+    return et.TUnion(variants)
+
+
+ANY = et.TAny()
+STR = et.TStr()
+INT = et.TInt()
+INLINE = et.TInline()
+BLOCK = et.TBlock()
+LIST = et.TList()
+NAME = et.TName()
+
+Q_ANY = et.TQuoted(ANY)
+Q_STR = et.TQuoted(STR)
+Q_NAME = et.TQuoted(NAME)
+Q_NAME_STR = et.TQuoted(et.TSexpr(NAME, (STR,)))
+Q_NAME_ANY = et.TQuoted(et.TSexpr(NAME, (ANY,)))
+
+
+BUILTIN_TYPES: Dict[str, et.EntityType] = {
+    # fnl.definitions
+    "(λ ...inline . inline)": _fn([], INLINE, INLINE),
+    "(λ ...inline . block)": _fn([], INLINE, BLOCK),
+    "(λ ...inline|block . block)": _fn([], _union(INLINE, BLOCK), BLOCK),
+    "(λ ...inline|block . inline|block)": _fn([], _union(INLINE, BLOCK), _union(INLINE, BLOCK)),
+    "(λ str . inline)": _fn([STR], None, INLINE),
+    "(λ str inline . inline)": _fn([STR, INLINE], None, INLINE),
+    "(λ int . (λ ...inline . block))": _fn([INT], None, _fn([], INLINE, BLOCK)),
+    "(λ str . (λ ...inline . inline))": _fn([STR], None, _fn([], INLINE, INLINE)),
+    "(λ . block)": _fn([], None, BLOCK),
+    "(λ . inline)": _fn([], None, INLINE),
+    "(λ inline . inline)": _fn([INLINE], None, INLINE),
+    "(λ block . block)": _fn([BLOCK], None, BLOCK),
+    "(λ any . inline)": _fn([ANY], None, INLINE),
+    "(λ ...any . list)": _fn([], ANY, LIST),
+    "(λ int . list)": _fn([INT], None, LIST),
+    "(λ int int . list)": _fn([INT, INT], None, LIST),
+    "(λ list . int)": _fn([LIST], None, INT),
+    "(λ list int . any)": _fn([LIST, INT], None, ANY),
+    "(λ list int int . list)": _fn([LIST, INT, INT], None, LIST),
+
+    # fnl.fnlx
+    "(λ ...&[name]|&[(name str)]|inline|block . block)":
+        _fn([], _union(Q_NAME, Q_NAME_STR, INLINE, BLOCK), BLOCK),
+    "(λ str|&[name] ...&[str]|&[name]|&[(name str)]|inline|block . block)":
+        _fn([_union(STR, Q_NAME)], _union(Q_STR, Q_NAME, Q_NAME_STR, INLINE, BLOCK), BLOCK),
+    "(λ str|&[name] ...&[name]|&[(name str)]|inline . inline)":
+        _fn([_union(STR, Q_NAME)], _union(Q_NAME, Q_NAME_STR, INLINE), INLINE),
+
+    # fnl.bindings
+    "(λ &[name] . any)": _fn([Q_NAME], None, ANY),
+    "(λ &[name] . str)": _fn([Q_NAME], None, STR),
+    "(λ &[any] . any)": _fn([Q_ANY], None, ANY),
+    "(λ &[name] any &[any] . any)": _fn([Q_NAME, ANY, Q_ANY], None, ANY),
+    "(λ &[name] any &[any] . &[any])": _fn([Q_NAME, ANY, Q_ANY], None, Q_ANY),
+    "(λ &[name] &[any] &[any] . any)": _fn([Q_NAME, Q_ANY, Q_ANY], None, ANY),
+    "(λ &[name] list &[any] . any)": _fn([Q_NAME, LIST, Q_ANY], None, ANY),
+    "(λ ...&[(name any)] . (λ &[any] . any))": _fn([], Q_NAME_ANY, _fn([Q_ANY], None, ANY)),
+    "(λ ...&[(name any)] . &[any])": _fn([], Q_NAME_ANY, Q_ANY),
+    "(λ . &[any])": _fn([], None, Q_ANY),
+    "(λ any . str)": _fn([ANY], None, STR),
+}
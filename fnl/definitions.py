@@ -242,7 +242,9 @@ def pre():
 @fn(BUILTINS, "map")
 def map_function():
     """
-    Map a function onto a list of values.
+    Map a function onto a list of values. The values can be passed as
+    arguments, or as a single %%(tt "list")%%, which is mapped one element
+    at a time while the page is being written.
 
     The overloads are messy and will soon be refactored.
     """
@@ -256,10 +258,15 @@ def map_function():
     INPUT_FN_STR2 = et.TFunction((), et.TStr(), et.TInline())
     FN_TYPE_STR = et.TFunction((), et.TStr(), et.TInline())
 
+    LIST_TYPE_INLINE = et.TFunction((et.TList(),), None, et.TInline())
+
     def from_fn_inline(fn):
         def from_inl(*args):
             return e.InlineConcat(tuple(e.Sexpr(fn, (arg,)) for arg in args))
-        return e.Function({FN_TYPE_INLINE: from_inl})
+
+        def from_list(lst):
+            return e.InlineMap(fn, lst.items)
+        return e.Function({FN_TYPE_INLINE: from_inl, LIST_TYPE_INLINE: from_list})
     yield ((INPUT_FN_INLINE,), None, FN_TYPE_INLINE, from_fn_inline)
     yield ((INPUT_FN_INLINE2,), None, FN_TYPE_INLINE, from_fn_inline)  # HACK
     yield ((INPUT_FN_STR,), None, FN_TYPE_STR, from_fn_inline)
@@ -269,10 +276,15 @@ def map_function():
     INPUT_FN_BLOCK2 = et.TFunction((), et.TUnion((et.TBlock(), et.TInline())), et.TBlock())  # HACK
     FN_TYPE_BLOCK = et.TFunction((), et.TUnion((et.TBlock(), et.TInline())), et.TBlock())
 
+    LIST_TYPE_BLOCK = et.TFunction((et.TList(),), None, et.TBlock())
+
     def from_fn_block(fn):
         def from_ren(*args):
             return e.BlockConcat(tuple(e.Sexpr(fn, (arg,)) for arg in args))  # type: ignore
-        return e.Function({FN_TYPE_BLOCK: from_ren})
+
+        def from_list(lst):
+            return e.BlockMap(fn, lst.items)
+        return e.Function({FN_TYPE_BLOCK: from_ren, LIST_TYPE_BLOCK: from_list})
     yield ((INPUT_FN_BLOCK,), None, FN_TYPE_BLOCK, from_fn_block)
     yield ((INPUT_FN_BLOCK2,), None, FN_TYPE_BLOCK, from_fn_block)  # HACK
 
@@ -325,6 +337,73 @@ def separated():
     yield ((et.TInline(),), None, FN_TYPE, from_str)
 
 
+@fn(BUILTINS, "list")
+def make_list():
+    """
+    Make a list of values: %%(tt "(list \\"a\\" \\"b\\" \\"c\\")")%%.
+    See also %%(tt "length")%%, %%(tt "index")%%, %%(tt "slice")%% and
+    %%(tt "range")%%.
+    """
+    def from_any(*items):
+        return e.FnlList(items)
+    yield ("(λ ...any . list)", from_any)
+
+
+@fn(BUILTINS, "range")
+def make_range():
+    """
+    The list of integers from 0 (or from the first argument) up to, but not
+    including, the last argument: %%(tt "(range 3)")%% is 0, 1, 2. The
+    integers are only made when they're used.
+    """
+    def from_stop(stop: e.Integer):
+        return e.FnlList(e.LazyRange(range(stop.value)))
+    yield ("(λ int . list)", from_stop)
+
+    def from_start_stop(start: e.Integer, stop: e.Integer):
+        return e.FnlList(e.LazyRange(range(start.value, stop.value)))
+    yield ("(λ int int . list)", from_start_stop)
+
+
+@fn(BUILTINS, "length")
+def length():
+    """
+    The number of elements in a list.
+    """
+    def from_list(lst: e.FnlList):
+        return e.Integer(len(lst.items))
+    yield ("(λ list . int)", from_list)
+
+
+@fn(BUILTINS, "index")
+def index():
+    """
+    The element of a list at a position, starting from 0.
+    Negative positions count from the end: %%(tt "(index (list 1 2 3) -1)")%% is 3.
+    """
+    def from_list(lst: e.FnlList, position: e.Integer):
+        if not -len(lst.items) <= position.value < len(lst.items):
+            raise TypeError(
+                f"Index {position.value} is out of range for a list of length {len(lst.items)}"
+            )
+        return lst.items[position.value]
+    yield ("(λ list int . any)", from_list)
+
+
+@fn(BUILTINS, "slice")
+def slice_list():
+    """
+    The elements of a list from a position up to, but not including, another
+    one, like Python's %%(tt "items[start:stop]")%%.
+    """
+    def from_list(lst: e.FnlList, start: e.Integer, stop: e.Integer):
+        return e.FnlList(lst.items[start.value:stop.value])
+    yield ("(λ list int int . list)", from_list)
+
+
+NO_BREAK = e.TextTransform({" ": "&nbsp;"})
+
+
 @fn(BUILTINS, "nobr")
 def nobr():
     """
@@ -333,7 +412,7 @@ def nobr():
     Does %%(bf "not")%% represent the %%(tt "nobr")%% HTML TAG.
     """
     def from_ren(ren: e.Entity):
-        return e.AfterRender(ren, lambda s: s.replace(" ", "&nbsp;"))
+        return e.AfterRender(ren, NO_BREAK)
     yield ("(λ inline . inline)", from_ren)
     yield ("(λ block . block)", from_ren)
 
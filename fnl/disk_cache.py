@@ -0,0 +1,143 @@
+"""
+Persistent cache of rendered HTML, shared between processes and builds.
+
+Unlike `fnl.render_cache`, which caches fragments within a process,
+`DiskCache` maps the inputs of a whole render (the source and the runtime)
+to its output, so a hit skips parsing and evaluation entirely.
+
+>>> cache = DiskCache("~/.cache/fnl/pages.sqlite3")
+>>> html = fnl.html(source, extensions, disk_cache=cache)
+
+The key is built from the source and the fingerprint of the runtime (see
+`fnl.fingerprint.runtime_fingerprint`), which includes the values captured
+by the extensions. If the runtime holds a value that can't be fingerprinted,
+there's no key and the render isn't cached. If the output depends on
+anything else (e.g. an extension that reads a file or a global variable),
+pass it as the `salt`.
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Mapping, Optional, Union
+from . import entities as e
+from .fingerprint import fingerprint, input_fingerprint
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS renders (
+    key BLOB PRIMARY KEY,
+    html TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS renders_last_used ON renders (last_used);
+"""
+
+
+class DiskCache:
+    """
+    An SQLite database of rendered HTML, with the least recently used
+    entries evicted when the total size of the HTML exceeds `max_bytes`.
+
+    The database is in WAL mode, so many processes (and threads: each
+    gets its own connection) can read and write it at the same time.
+    Writers wait for each other for up to `timeout` seconds.
+    """
+    def __init__(
+            self,
+            path: Union[str, "os.PathLike[str]"],
+            max_bytes: int = 256 * 1024 * 1024,
+            timeout: float = 30.0,
+    ):
+        self.path = Path(path).expanduser()
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections can't be shared between threads, nor survive a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def key(
+            self,
+            source: Union[str, e.Entity],
+            runtime: Mapping[str, e.Entity],
+            salt: bytes = b"",
+    ) -> Optional[bytes]:
+        """
+        Return the key of the render of `source` with `runtime`, or None
+        if a parsed `source` or the runtime can't be fingerprinted.
+        """
+        if isinstance(source, str):
+            source_key: Optional[bytes] = b"s" + source.encode("utf-8")
+        elif (structure := fingerprint(source)) is not None:
+            source_key = b"e" + structure
+        else:
+            return None
+        return input_fingerprint(source_key, runtime, salt)
+
+    def get(self, key: bytes) -> Optional[str]:
+        connection = self._connection()
+        row = connection.execute("SELECT html FROM renders WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE renders SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key: bytes, html: str):
+        size = len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO renders (key, html, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, html, size, time.time()),
+            )
+            self._evict(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection: sqlite3.Connection):
+        (total,) = connection.execute("SELECT COALESCE(SUM(size), 0) FROM renders").fetchone()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        evicted = []
+        for (key, size) in connection.execute("SELECT key, size FROM renders ORDER BY last_used"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany("DELETE FROM renders WHERE key = ?", evicted)
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM renders").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        connection = self._connection()
+        return connection.execute("SELECT COALESCE(SUM(size), 0) FROM renders").fetchone()[0]
+
+    def clear(self):
+        self._connection().execute("DELETE FROM renders")
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local.connection = None
@@ -0,0 +1,607 @@
+"""
+Compiles the documentation in `src/` into HTML pages in `html/`.
+
+The pages can refer to each other with `$link-to` and `$source-of`, which
+look the other pages up in the store (filename -> (title, source)). To make
+the result independent of the order (and the process) in which the pages
+are compiled, `build` first collects the titles and the sources of all the
+pages with `read_metadata`, which only evaluates the header of `$docs`.
+Then every page is rendered once, with all of the pages in the store.
+
+The state of the page being compiled is a `PageContext` in a context
+variable, so pages can be compiled in many threads at once.
+
+The pages that didn't change since the last build are skipped, see
+`fnl.docs.manifest`.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+import fnl
+from fnl.disk_cache import DiskCache
+from fnl.docs.highlight import highlight
+from fnl.docs.live_reload import LiveReloadServer
+from fnl.docs.manifest import MANIFEST_NAME, Manifest, PageRecord, content_hash
+from fnl.fingerprint import runtime_fingerprint
+from fnl.profile import Profile, count_nodes
+from fnl.render_cache import RenderCache
+from pathlib import Path
+import string
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    A `string.Template` split once into static chunks and the names of the
+    slots between them, so that rendering it doesn't scan the text again.
+    """
+    chunks: Tuple[fnl.e.RawHtml, ...]  # one more than there are slots
+    slots: Tuple[str, ...]
+
+    @staticmethod
+    def compile(template_html: str) -> "CompiledTemplate":
+        chunks = []
+        slots = []
+        text = ""
+        last_pos = 0
+        for m in string.Template.pattern.finditer(template_html):
+            text += template_html[last_pos:m.start()]
+            last_pos = m.end()
+            if m.group("escaped") is not None:
+                text += "$"
+            elif (name := m.group("named") or m.group("braced")) is not None:
+                chunks.append(fnl.e.RawHtml(text))
+                slots.append(name)
+                text = ""
+            else:
+                raise ValueError(f"Invalid placeholder in the template at {m.start()}")
+        chunks.append(fnl.e.RawHtml(text + template_html[last_pos:]))
+        return CompiledTemplate(tuple(chunks), tuple(slots))
+
+
+@dataclass
+class Template(fnl.e.Entity):
+    filename: str
+    template: CompiledTemplate
+    parts: Dict[str, fnl.e.Entity]
+
+    def render_block(self, runtime: Dict[str, fnl.e.Entity]) -> fnl.e.HtmlRender:
+        profile = _page.get().profile
+        if profile is None:
+            return self._render_block(runtime)
+        # `fnl.profile.count_nodes` doesn't know what's inside a `Template`
+        profile.nodes += sum(count_nodes(part) for part in self.parts.values())
+        with profile.phase("template"):
+            return self._render_block(runtime)
+
+    def _render_block(self, runtime: Dict[str, fnl.e.Entity]) -> fnl.e.HtmlRender:
+        # The parts aren't rendered to strings here: the serializer streams
+        # them into their slots
+        rendered_parts = {
+            name: render_cache.render(part, runtime)
+            for name, part in self.parts.items()
+        }
+        if live_reload is not None:
+            # Rendered without the cache, so that the next version of the page
+            # can be compared with this tree element by element
+            mount = self.parts["mount"].render(runtime)
+            rendered_parts["mount"] = mount
+            rendered_parts["livereload"] = fnl.e.RawHtml(live_reload.script)
+            live_reload.record(self.filename, rendered_parts["title"].as_text(), mount)
+
+        pieces = [self.template.chunks[0]]
+        for (slot, chunk) in zip(self.template.slots, self.template.chunks[1:]):
+            pieces.append(rendered_parts[slot])
+            pieces.append(chunk)
+        return fnl.e.Concat(pieces)
+
+
+template_html = (Path(__file__).parent / "template.html").read_text()
+# The live reload script has a line of its own in the template, which is
+# dropped along with the slot when live reload is off
+live_reload_template = CompiledTemplate.compile(template_html)
+template = CompiledTemplate.compile(
+    re.sub(r"^[ \t]*\$livereload[ \t]*\n", "", template_html, flags=re.MULTILINE)
+)
+
+extensions: Dict[str, fnl.e.Entity] = {}
+
+Store = Mapping[str, Tuple[str, str]]  # filename -> (title, source)
+
+
+@dataclass
+class PageContext:
+    """The state of the page being compiled"""
+    filename: str
+    store: Store
+    # (title, source) of the page, set by `$docs`
+    entry: Optional[Tuple[str, str]] = None
+    # the pages looked up with `$link-to` and `$source-of`
+    references: Set[str] = field(default_factory=set)
+    profile: Optional[Profile] = None
+
+    def look_up(self, filename: str) -> Tuple[str, str]:
+        self.references.add(filename)
+        return self.store.get(filename, ("title?", "source?"))
+
+
+_page: "ContextVar[PageContext]" = ContextVar("fnl.docs page")
+
+# Whole pages saved between builds, see `--disk-cache`
+disk_cache: Optional[DiskCache] = None
+
+# Shared between the pages, so that the navigation is rendered once
+render_cache = RenderCache()
+
+# Only in watch mode
+live_reload: Optional[LiveReloadServer] = None
+
+
+@fnl.definitions.fn(extensions, "$docs")
+def make_docs():
+    def _make_docs(
+        filename: fnl.e.String,
+        source: fnl.e.String,
+        title: fnl.e.String,
+        *elements: fnl.e.Entity
+    ):
+        _page.get().entry = (title.value, source.value)
+        return Template(
+            filename.value,
+            template if live_reload is None else live_reload_template,
+            {
+                "title": title,
+                "mount": fnl.e.BlockConcat(elements),
+            }
+        )
+    yield ("(λ str str str ...inline|block . block)", _make_docs)
+
+
+@fnl.definitions.fn(extensions, "$link-to")
+def link_to():
+    def _link_to(filename: fnl.e.String):
+        (title, _source) = _page.get().look_up(filename.value)
+        return fnl.e.InlineTag("a", f'href="{filename.value}"', (fnl.e.String(title),))
+    yield ("(λ str . inline)", _link_to)
+
+
+@fnl.definitions.fn(extensions, "$source-of")
+def source_of():
+    def _source_of(filename: fnl.e.String):
+        (_title, source) = _page.get().look_up(filename.value)
+        return fnl.e.String(source)
+    yield ("(λ str . str)", _source_of)
+
+
+@fnl.definitions.fn(extensions, "$box")
+def box():
+    def _box(*elements: fnl.e.Entity):
+        return fnl.e.BlockTag("div", 'class="fnl--box"', elements)
+    yield ("(λ inline|block . block)", _box)
+
+
+@fnl.definitions.fn(extensions, "$fnl")
+def fnl_highlight():
+    # Wrap FNL source code tokens in <span>s with appropriate CSS classes
+    # so that a CSS stylesheet can style the tokens. The entities are
+    # cached, see `fnl.docs.highlight`.
+    def _fnl_highlight(s: fnl.e.String):
+        return highlight(s.value)
+    yield ("(λ str . inline)", _fnl_highlight)
+
+
+def compile_fnl(
+        source: str,
+        target_filename: str,
+        tree: Optional[fnl.e.Entity] = None,
+        extensions: Optional[Dict[str, fnl.e.Entity]] = None,
+        context: Optional[PageContext] = None,
+):
+    """Render a page; what it looked up and added to the store goes to the `context`"""
+    if context is None:
+        context = PageContext(target_filename, {})
+    t1 = time.time()
+    token = _page.set(context)
+    try:
+        html = fnl.html(source if tree is None else tree, {
+                **(runtime_extensions() if extensions is None else extensions),
+                "$filename": fnl.e.String(target_filename),
+                "$source": fnl.e.String(source),
+            }, cache=render_cache, profile=context.profile)
+    finally:
+        _page.reset(token)
+    t2 = time.time()
+    return html, t2 - t1
+
+
+def runtime_extensions() -> Dict[str, fnl.e.Entity]:
+    return {**extensions, **fnl.x, **fnl.bindings()}
+
+
+def build_version() -> str:
+    """
+    Changes when a change in `fnl`, the extensions, the template or the
+    live reload script can change the pages
+    """
+    runtime = {**fnl.definitions.BUILTINS, **runtime_extensions()}
+    # If the runtime can't be fingerprinted, it can't be told whether it
+    # changed, so every build gets a version of its own
+    fingerprint = runtime_fingerprint(runtime)
+    digest = hashlib.sha256(fingerprint if fingerprint is not None else os.urandom(16))
+    digest.update(template_html.encode("utf-8"))
+    if live_reload is not None:
+        digest.update(live_reload.script.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class Page:
+    filename: str
+    html: str
+    delta_time: float
+    # (title, source) of the page, if it's a `$docs` page
+    entry: Optional[Tuple[str, str]]
+    # the pages it looked up with `$link-to` and `$source-of`
+    references: FrozenSet[str]
+    profile: Optional[Profile] = None
+
+
+def compile_page(source_path: Path, store: Store, profile: Optional[Profile] = None) -> Page:
+    """Compile a page, looking other pages up in the `store`"""
+    source = _read(source_path, profile)
+    return compile_source(source, source_path.with_suffix(".html").name, store, profile=profile)
+
+
+def compile_source(
+        source: str,
+        target_filename: str,
+        store: Store,
+        extensions: Optional[Dict[str, fnl.e.Entity]] = None,
+        profile: Optional[Profile] = None,
+) -> Page:
+    """Same as `compile_page`, optionally with prebuilt `extensions`"""
+    if extensions is None:
+        extensions = runtime_extensions()
+    if disk_cache is not None and live_reload is None:
+        return _compile_with_disk_cache(source, target_filename, store, extensions, profile)
+    return _compile_source(source, target_filename, store, extensions, profile)
+
+
+def _compile_source(
+        source: str,
+        target_filename: str,
+        store: Store,
+        extensions: Dict[str, fnl.e.Entity],
+        profile: Optional[Profile],
+) -> Page:
+    tree = parse_cached(target_filename, source, profile)
+    context = PageContext(target_filename, store, store.get(target_filename), profile=profile)
+    html, delta_time = compile_fnl(source, target_filename, tree, extensions, context)
+    return Page(
+        target_filename,
+        html,
+        delta_time,
+        context.entry,
+        frozenset(context.references),
+        profile,
+    )
+
+
+def read_metadata(
+        source: str,
+        target_filename: str,
+        tree: fnl.e.Entity,
+        extensions: Optional[Dict[str, fnl.e.Entity]] = None,
+) -> Optional[Tuple[str, str]]:
+    """
+    Return the (title, source) entry that the page will add to the store,
+    evaluating only the header of its `$docs` call (the filename, the source
+    and the title) and not rendering anything.
+
+    Return None if the page doesn't start with a `$docs` call with a
+    header made of strings; such a page only adds itself to the store
+    while it's rendered.
+    """
+    if not (
+        isinstance(tree, fnl.e.Sexpr)
+        and isinstance(tree.fn, fnl.e.Name)
+        and tree.fn.name == "$docs"
+        and len(tree.args) >= 3
+    ):
+        return None
+    runtime = {
+        **fnl.definitions.BUILTINS,
+        **(runtime_extensions() if extensions is None else extensions),
+        "$filename": fnl.e.String(target_filename),
+        "$source": fnl.e.String(source),
+    }
+    token = _page.set(PageContext(target_filename, {}))
+    try:
+        header = [arg.evaluate(runtime) for arg in tree.args[:3]]
+    finally:
+        _page.reset(token)
+    if not all(isinstance(value, fnl.e.String) for value in header):
+        return None
+    (filename, page_source, title) = (value.value for value in header)  # type: ignore
+    if filename != target_filename:
+        return None
+    return (title, page_source)
+
+
+def _compile_with_disk_cache(
+        source: str,
+        target_filename: str,
+        store: Store,
+        extensions: Dict[str, fnl.e.Entity],
+        profile: Optional[Profile],
+) -> Page:
+    # Besides the source and the runtime, a page depends on the entries of
+    # the store that it looks up. Those are known after it's rendered, so
+    # they're saved under a key of their own.
+    assert disk_cache is not None
+    runtime = {
+        **fnl.definitions.BUILTINS,
+        **extensions,
+        "$filename": fnl.e.String(target_filename),
+        "$source": fnl.e.String(source),
+    }
+    version = _build_version_bytes()
+    references_key = disk_cache.key(source, runtime, version + b"references")
+    if references_key is None:  # the runtime can't be fingerprinted
+        return _compile_source(source, target_filename, store, extensions, profile)
+    if (known := disk_cache.get(references_key)) is not None:  # type: ignore
+        references = frozenset(json.loads(known))
+        html_key = disk_cache.key(source, runtime, version + _store_digest(references, store))
+        if (html := disk_cache.get(html_key)) is not None:  # type: ignore
+            return Page(target_filename, html, 0.0, store.get(target_filename), references, profile)
+
+    page = _compile_source(source, target_filename, store, extensions, profile)
+    html_key = disk_cache.key(source, runtime, version + _store_digest(page.references, store))
+    disk_cache.put(html_key, page.html)  # type: ignore
+    disk_cache.put(references_key, json.dumps(sorted(page.references)))  # type: ignore
+    return page
+
+
+def _read_metadata_with_disk_cache(source: str, target_filename: str) -> Optional[Tuple[str, str]]:
+    assert disk_cache is not None
+    runtime = {"$filename": fnl.e.String(target_filename)}
+    key = disk_cache.key(source, runtime, _build_version_bytes() + b"metadata")
+    if (known := disk_cache.get(key)) is not None:  # type: ignore
+        entry = json.loads(known)
+        return None if entry is None else tuple(entry)  # type: ignore
+    entry = read_metadata(source, target_filename, parse_cached(target_filename, source))
+    disk_cache.put(key, json.dumps(entry))  # type: ignore
+    return entry
+
+
+def _store_digest(filenames: FrozenSet[str], store: Store) -> bytes:
+    entries = [(filename, store.get(filename)) for filename in sorted(filenames)]
+    return hashlib.sha256(json.dumps(entries).encode("utf-8")).digest()
+
+
+_build_version: Optional[bytes] = None
+
+
+def _build_version_bytes() -> bytes:
+    global _build_version
+    if _build_version is None:
+        _build_version = build_version().encode("ascii")
+    return _build_version
+
+
+# Parsed sources, so that a page is parsed once for `read_metadata` and
+# rendering, and isn't parsed again in watch mode if it didn't change
+_parsed: Dict[str, Tuple[str, fnl.e.Entity]] = {}  # page filename -> (source, tree)
+
+
+def parse_cached(filename: str, source: str, profile: Optional[Profile] = None) -> fnl.e.Entity:
+    known = _parsed.get(filename)
+    if known is not None and known[0] == source:
+        return known[1]
+    if profile is None:
+        tree = fnl.parse(source)
+    else:
+        with profile.phase("parse"):
+            tree = fnl.parse(source)
+    _parsed[filename] = (source, tree)
+    return tree
+
+
+def _read(source_path: Path, profile: Optional[Profile]) -> str:
+    if profile is None:
+        return source_path.read_text()
+    with profile.phase("read"):
+        return source_path.read_text()
+
+
+def _metadata_job(source_path: str) -> Optional[Tuple[str, str]]:
+    path = Path(source_path)
+    filename = path.with_suffix(".html").name
+    try:
+        source = path.read_text()
+        if disk_cache is None:
+            return read_metadata(source, filename, parse_cached(filename, source))
+        return _read_metadata_with_disk_cache(source, filename)
+    except Exception as error:
+        # the exceptions from Lark can't be sent back from a worker process
+        message = f"Failed to compile {source_path}: {type(error).__name__}: {error}"
+        raise BuildError(message) from None
+
+
+def _compile(source_path: str, store: Store, profiled: bool) -> Page:
+    try:
+        return compile_page(Path(source_path), store, Profile() if profiled else None)
+    except Exception as error:
+        message = f"Failed to compile {source_path}: {type(error).__name__}: {error}"
+        raise BuildError(message) from None
+
+
+# The store of a worker process. It's sent once, when the worker starts,
+# rather than with every page: that would be O(pages²) data
+_worker_store: Dict[str, Tuple[str, str]] = {}
+
+
+def _compile_job(job: Tuple[str, Store, bool]) -> Page:
+    """Compile a page in a worker process, adding `updates` to its store first"""
+    (source_path, updates, profiled) = job
+    _worker_store.update(updates)
+    return _compile(source_path, _worker_store, profiled)
+
+
+class BuildError(Exception):
+    pass
+
+
+def _init_worker(disk_cache_path: Optional[str], store: Store):
+    global disk_cache, _worker_store
+    if disk_cache_path is not None:
+        disk_cache = DiskCache(disk_cache_path)
+    _worker_store = dict(store)
+
+
+def build(src_dir: Path, html_dir: Path, jobs: int = 1, profile: bool = False) -> List[Page]:
+    """
+    Compile the pages that changed since the last build and write them to
+    `html_dir`. Return the compiled pages.
+
+    A page is compiled again if its source changed, or if a page that it
+    refers to changed (was added, removed or edited). A file is only written
+    if its content changed.
+
+    With `jobs > 1` the pages are compiled in a pool of processes. The
+    output is the same either way.
+
+    With `profile`, each compiled page comes with a `fnl.profile.Profile`
+    of its compilation and writing.
+    """
+    source_paths = sorted(src_dir.glob("*.fnl"))
+    source_hashes = {path.name: content_hash(path.read_bytes()) for path in source_paths}
+    manifest = Manifest.load(html_dir)
+    version = build_version()
+    if manifest.version != version:
+        manifest = Manifest(version)
+
+    changed_sources = [
+        path for path in source_paths
+        if (record := manifest.pages.get(path.name)) is None
+        or record.source_hash != source_hashes[path.name]
+        or not (html_dir / record.filename).exists()
+    ]
+    unchanged_sources = set(source_paths).difference(changed_sources)
+    # the output files of the added, edited and removed sources
+    changed_pages = {path.with_suffix(".html").name for path in changed_sources}
+    changed_pages.update(
+        record.filename for source_name, record in manifest.pages.items()
+        if source_name not in source_hashes
+    )
+
+    def referring_to(filenames: Set[str], pages: Dict[Path, Page]) -> List[Path]:
+        return [
+            path for path in source_paths
+            if (path in pages and pages[path].references & filenames)
+            or (path not in pages and path in unchanged_sources
+                and manifest.pages[path.name].references & filenames)
+        ]
+
+    cache_path = None if disk_cache is None else str(disk_cache.path)
+    executor: Optional[ProcessPoolExecutor] = None
+
+    def start_workers(store: Store):
+        nonlocal executor
+        if jobs > 1:
+            executor = ProcessPoolExecutor(
+                jobs, initializer=_init_worker, initargs=(cache_path, store)
+            )
+
+    def stop_workers():
+        nonlocal executor
+        if executor is not None:
+            executor.shutdown()
+            executor = None
+
+    def run(job, work: list) -> list:
+        if executor is None:
+            return [job(item) for item in work]
+        return list(executor.map(job, work))
+
+    def compile_all(paths: List[Path], store: Store, updates: Store) -> List[Page]:
+        if executor is None:
+            return [_compile(str(path), store, profile) for path in paths]
+        # the workers got the store when they started
+        return run(_compile_job, [(str(path), updates, profile) for path in paths])
+
+    try:
+        complete_store = {
+            record.filename: record.entry
+            for source_name, record in manifest.pages.items()
+            if record.entry is not None and Path(src_dir, source_name) in unchanged_sources
+        }
+        if changed_sources:
+            start_workers({})
+        entries = run(_metadata_job, [str(path) for path in changed_sources])
+        stop_workers()
+        for (path, entry) in zip(changed_sources, entries):
+            if entry is not None:
+                complete_store[path.with_suffix(".html").name] = entry
+
+        to_compile = sorted({*changed_sources, *referring_to(changed_pages, {})})
+        if to_compile:
+            start_workers(complete_store)
+        pages = dict(zip(to_compile, compile_all(to_compile, complete_store, {})))
+
+        # The pages without a `$docs` header found by `read_metadata` could
+        # add themselves to the store only now
+        late_pages = set()
+        for page in pages.values():
+            if page.entry != complete_store.get(page.filename):
+                late_pages.add(page.filename)
+                complete_store[page.filename] = page.entry  # type: ignore
+        if late_pages:
+            again = referring_to(late_pages, pages)
+            updates = {filename: complete_store[filename] for filename in late_pages}
+            for (path, page) in zip(again, compile_all(again, complete_store, updates)):
+                if page.profile is not None and path in pages:
+                    page.profile.add_time(pages[path].profile)  # type: ignore
+                pages[path] = page
+    finally:
+        stop_workers()
+
+    new_manifest = Manifest(version, {
+        source_name: record for source_name, record in manifest.pages.items()
+        if source_name in source_hashes
+    })
+    compiled = [(path, pages[path]) for path in source_paths if path in pages]
+    for (path, page) in compiled:
+        if page.profile is None:
+            write_if_changed(html_dir / page.filename, page.html)
+        else:
+            with page.profile.phase("write"):
+                write_if_changed(html_dir / page.filename, page.html)
+        new_manifest.pages[path.name] = PageRecord(
+            source_hashes[path.name], page.filename, page.entry, page.references,
+        )
+    if new_manifest != manifest:
+        write_atomically(html_dir / MANIFEST_NAME, new_manifest.dumps())
+    return [page for (_path, page) in compiled]
+
+
+def write_if_changed(path: Path, text: str):
+    try:
+        if path.read_text() == text:
+            return
+    except OSError:
+        pass
+    write_atomically(path, text)
+
+
+def write_atomically(path: Path, text: str):
+    """Write a file so that readers see either the old or the new version"""
+    temporary_path = path.with_name(f".{path.name}.tmp")
+    temporary_path.write_text(text)
+    os.replace(temporary_path, path)
@@ -0,0 +1,53 @@
+"""
+Syntax highlighting of FNL code for the `$fnl` extension.
+
+Every token is wrapped in a `<span>` with a CSS class for its kind (and
+whitespace, including comments, in `code--fnl--ws`), and every s-expression
+is wrapped in a `code--fnl--sexpr` span, so that `style.css` can style them.
+"""
+from functools import lru_cache
+from typing import List
+import fnl
+
+
+@lru_cache(maxsize=1024)
+def highlight(code: str) -> fnl.e.InlineConcat:
+    """
+    Return the highlighted `code` as an inline entity.
+
+    The tags are raw HTML, but the text of the tokens is kept in strings, so
+    that it's escaped (and transformed, e.g. inside `nobr`) where the entity
+    is serialized. The same snippets are shown on many pages (and the whole
+    source of a page on that page), so the results are cached.
+    """
+    parts: List[fnl.e.Entity] = []
+    markup = ""  # the tags since the last string
+
+    def add_text(css_class: str, text: str):
+        nonlocal markup
+        parts.append(fnl.e.InlineRaw(f'{markup}<span class="{css_class}">'))
+        parts.append(fnl.e.String(text))
+        markup = "</span>"
+
+    last_pos = 0
+    for token in fnl.parser.lex(code):
+        # the lexer ignores comments and whitespace, so we need to collect them:
+        if token.start_pos != last_pos:
+            add_text("code--fnl--ws", code[last_pos:token.start_pos])
+        last_pos = token.start_pos + len(token)
+
+        css_class = _css_class(token.type)
+        if token.value == "(":
+            markup += f'<span class="code--fnl--sexpr"><span class="{css_class}">(</span>'
+        elif token.value == ")":
+            markup += f'<span class="{css_class}">)</span></span>'
+        else:
+            add_text(css_class, token.value)
+    if markup:
+        parts.append(fnl.e.InlineRaw(markup))
+    return fnl.e.InlineConcat(tuple(parts))
+
+
+@lru_cache(maxsize=None)
+def _css_class(token_type: str) -> str:
+    return "code--fnl--" + token_type.lower().replace("_", "-")
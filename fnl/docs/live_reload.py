@@ -0,0 +1,134 @@
+"""
+Live reload for `python -m fnl.docs --watch`.
+
+In watch mode this server serves the pages, which include a small script
+listening to Server-Sent Events from the same server. When a page is recompiled, its new
+content is compared with the previous one using `fnl.html_diff`, and only
+the changed elements are sent to the browser.
+"""
+import functools
+import json
+import queue
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+import fnl
+from fnl.html_diff import diff
+
+
+_SCRIPT = """<script>
+(function () {
+    var page = location.pathname.split("/").pop() || "index.html";
+    var source = new EventSource("/events");
+    source.onmessage = function (event) {
+        var message = JSON.parse(event.data);
+        if (message.page !== page) return;
+        if (message.reload) { location.reload(); return; }
+        var mount = document.querySelector(".-mount");
+        for (var i = 0; i < message.patches.length; i++) {
+            var patch = message.patches[i];
+            var element = mount;
+            for (var j = 0; element && j < patch.path.length; j++) {
+                element = element.children[patch.path[j]];
+            }
+            if (!element) { location.reload(); return; }
+            element.innerHTML = patch.html;
+        }
+    };
+})();
+</script>"""
+
+
+Page = Tuple[str, fnl.e.HtmlRender]  # (title, content of the mount point)
+
+
+class LiveReloadServer:
+    """
+    Sends the changes in the pages to the browsers.
+
+    Pages are `record`ed while they're rendered, and the changes are
+    sent on `flush`, after the files are written.
+    """
+    def __init__(self, html_dir: Path, host: str = "127.0.0.1", port: int = 35729):
+        self._lock = threading.Lock()
+        self._clients: List["queue.Queue[str]"] = []
+        self._pages: Dict[str, Page] = {}
+        self._pending: Dict[str, Page] = {}
+        handler = functools.partial(_handler_for(self), directory=str(html_dir))
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_port}/"
+
+    @property
+    def script(self) -> str:
+        """The HTML to include in the pages"""
+        return _SCRIPT
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def record(self, page: str, title: str, mount: fnl.e.HtmlRender):
+        self._pending[page] = (title, mount)
+
+    def flush(self):
+        pending, self._pending = self._pending, {}
+        for page, (title, mount) in pending.items():
+            previous = self._pages.get(page)
+            self._pages[page] = (title, mount)
+            if previous is None:
+                # the page wasn't rendered in this session, so it can't be patched
+                self.publish({"page": page, "reload": True})
+                continue
+            (previous_title, previous_mount) = previous
+            if previous_title != title:
+                self.publish({"page": page, "reload": True})
+            elif patches := diff(previous_mount, mount):
+                self.publish({"page": page, "patches": [patch.as_json() for patch in patches]})
+
+    def publish(self, message: Dict[str, Any]):
+        data = json.dumps(message)
+        with self._lock:
+            for client in self._clients:
+                client.put(data)
+
+    def _subscribe(self) -> "queue.Queue[str]":
+        client: "queue.Queue[str]" = queue.Queue()
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def _unsubscribe(self, client: "queue.Queue[str]"):
+        with self._lock:
+            self._clients.remove(client)
+
+
+def _handler_for(server: LiveReloadServer):
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/events":
+                super().do_GET()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            client = server._subscribe()
+            try:
+                while True:
+                    try:
+                        chunk = f"data: {client.get(timeout=15)}\n\n"
+                    except queue.Empty:
+                        chunk = ": keep-alive\n\n"
+                    self.wfile.write(chunk.encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                server._unsubscribe(client)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,65 @@
+"""
+The record of the previous docs build, used to skip the pages that didn't change.
+
+It's stored as JSON in the output directory and holds, for every source
+file, the hash of its content, the (title, source) entry it added to the
+store and the pages it looked up. The whole manifest is invalidated when
+`version` (a fingerprint of `fnl`, the extensions and the template) changes.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Optional, Tuple
+
+
+MANIFEST_NAME = ".fnl-manifest.json"
+
+
+@dataclass(frozen=True)
+class PageRecord:
+    source_hash: str
+    filename: str
+    entry: Optional[Tuple[str, str]]
+    references: FrozenSet[str]
+
+
+@dataclass
+class Manifest:
+    version: str = ""
+    pages: Dict[str, PageRecord] = field(default_factory=dict)  # source name -> record
+
+    @staticmethod
+    def load(html_dir: Path) -> "Manifest":
+        try:
+            data = json.loads((html_dir / MANIFEST_NAME).read_text())
+            return Manifest(data["version"], {
+                source_name: PageRecord(
+                    record["source_hash"],
+                    record["filename"],
+                    None if record["entry"] is None else tuple(record["entry"]),  # type: ignore
+                    frozenset(record["references"]),
+                )
+                for source_name, record in data["pages"].items()
+            })
+        except (OSError, ValueError, KeyError, TypeError):
+            # missing or corrupted: everything is rebuilt
+            return Manifest()
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "version": self.version,
+            "pages": {
+                source_name: {
+                    "source_hash": record.source_hash,
+                    "filename": record.filename,
+                    "entry": record.entry,
+                    "references": sorted(record.references),
+                }
+                for source_name, record in sorted(self.pages.items())
+            }
+        }, indent=1, ensure_ascii=False)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
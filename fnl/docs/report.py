@@ -0,0 +1,40 @@
+"""
+The `--profile` report of `python -m fnl.docs`.
+"""
+import json
+import time
+from pathlib import Path
+from typing import List
+from fnl.docs.build import Page
+
+
+PHASES = ("read", "parse", "evaluate", "render", "template", "write")
+
+
+def print_profile(pages: List[Page]):
+    """Print the time (in milliseconds) spent on each page in each phase"""
+    header = f"{'page':30}" + "".join(f"{phase:>10}" for phase in PHASES)
+    print(header + f"{'total':>10}{'nodes':>10}{'bytes':>10}")
+    for page in pages:
+        if page.profile is None:
+            continue
+        row = f"{page.filename:30}"
+        for phase in PHASES:
+            row += f"{page.profile.phases.get(phase, 0.0) * 1000:10.2f}"
+        profile = page.profile
+        row += f"{profile.total * 1000:10.2f}{profile.nodes:10}{profile.output_bytes:10}"
+        print(row)
+
+
+def write_profile(path: Path, pages: List[Page], wall_time: float, jobs: int):
+    report = {
+        "timestamp": time.time(),
+        "wall_time": wall_time,
+        "jobs": jobs,
+        "pages": {
+            page.filename: page.profile.as_json()
+            for page in pages
+            if page.profile is not None
+        },
+    }
+    path.write_text(json.dumps(report, indent=2))
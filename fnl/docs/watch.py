@@ -0,0 +1,165 @@
+"""
+Watch mode of `python -m fnl.docs`.
+
+`WatchDaemon` keeps the state of the build in memory between rebuilds: the
+parsed sources, the runtime extensions, the render cache, the store (built
+from the manifest) and the manifest (which says what pages refer to what).
+When a source changes, its entry in the store is updated with
+`build.read_metadata`, and then the page is compiled again along with the
+pages that refer to it, e.g. the index after a title changes.
+"""
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+import fnl
+from fnl.bindings import SCOPE_KEY, Scope
+from fnl.docs import build
+from fnl.docs.manifest import MANIFEST_NAME, Manifest, PageRecord, content_hash
+
+try:
+    import watchgod
+except ImportError:
+    watchgod = None
+
+
+class WatchDaemon:
+    def __init__(self, src_dir: Path, html_dir: Path):
+        """Should be created after `build.build`, which writes the manifest"""
+        self.src_dir = src_dir
+        self.html_dir = html_dir
+        self.manifest = Manifest.load(html_dir)
+        self.extensions = build.runtime_extensions()
+        self.store: Dict[str, Tuple[str, str]] = {
+            record.filename: record.entry
+            for record in self.manifest.pages.values()
+            if record.entry is not None
+        }
+
+    def run(self, changes: Iterable[Set[Path]]):
+        for changed_paths in changes:
+            t1 = time.perf_counter()
+            pages = self.rebuild(changed_paths)
+            if build.live_reload is not None:
+                build.live_reload.flush()
+            t2 = time.perf_counter()
+            if pages:
+                filenames = ", ".join(page.filename for page in pages)
+                print(f"Compiled {filenames} in {(t2 - t1) * 1000:.1f} ms")
+
+    def rebuild(self, changed_paths: Iterable[Path]) -> List[build.Page]:
+        """Compile the changed pages and the pages that refer to them"""
+        changed_sources: Dict[Path, Tuple[str, str]] = {}  # path -> (source, source hash)
+        changed_pages: Set[str] = set()
+        for path in sorted(changed_paths):
+            if path.suffix != ".fnl":
+                continue
+            record = self.manifest.pages.get(path.name)
+            try:
+                source_hash = content_hash(path.read_bytes())
+                source = path.read_text()
+            except FileNotFoundError:
+                if record is not None:
+                    del self.manifest.pages[path.name]
+                    self.store.pop(record.filename, None)
+                    changed_pages.add(record.filename)
+                continue
+            if record is not None and record.source_hash == source_hash:
+                continue
+            filename = path.with_suffix(".html").name
+            try:
+                tree = build.parse_cached(filename, source)
+                entry = build.read_metadata(source, filename, tree, self._extensions())
+            except Exception as error:
+                # keep watching: the file is probably being edited
+                print(f"Failed to compile {path.name}: {type(error).__name__}: {error}")
+                continue
+            self.store.pop(filename, None)
+            if entry is not None:
+                self.store[filename] = entry
+            changed_sources[path] = (source, source_hash)
+            changed_pages.add(filename)
+
+        # the store is up to date, so every page is rendered once
+        dependents = {
+            self.src_dir / source_name
+            for source_name, record in self.manifest.pages.items()
+            if record.references & changed_pages
+        }
+        pages: Dict[Path, build.Page] = {}
+        for path in sorted(dependents.union(changed_sources)):
+            if path in changed_sources:
+                (source, source_hash) = changed_sources[path]
+            else:
+                source = path.read_text()
+                source_hash = self.manifest.pages[path.name].source_hash
+            if (page := self._compile(path, source)) is not None:
+                pages[path] = page
+                if page.entry is not None:
+                    # a page without a `$docs` header adds itself only now
+                    self.store[page.filename] = page.entry
+                self.manifest.pages[path.name] = PageRecord(
+                    source_hash, page.filename, page.entry, page.references,
+                )
+
+        for page in pages.values():
+            build.write_if_changed(self.html_dir / page.filename, page.html)
+        if pages or changed_pages:
+            build.write_atomically(self.html_dir / MANIFEST_NAME, self.manifest.dumps())
+        return list(pages.values())
+
+    def _extensions(self) -> Dict[str, fnl.e.Entity]:
+        return {**self.extensions, SCOPE_KEY: Scope()}
+
+    def _compile(self, path: Path, source: str):
+        try:
+            filename = path.with_suffix(".html").name
+            return build.compile_source(source, filename, self.store, self._extensions())
+        except Exception as error:
+            print(f"Failed to compile {path.name}: {type(error).__name__}: {error}")
+            return None
+
+
+def watch_changes(src_dir: Path) -> Iterator[Set[Path]]:
+    """Yield the paths that changed, a burst of changes at a time"""
+    if watchgod is not None:
+        for changes in watchgod.watch(src_dir):
+            yield {Path(path) for (_kind, path) in changes}
+    else:
+        yield from poll_changes(src_dir)
+
+
+def poll_changes(
+        src_dir: Path,
+        interval: float = 0.2,
+        debounce: float = 0.05,
+) -> Iterator[Set[Path]]:
+    """A fallback for `watchgod`, comparing the modification times of the sources"""
+    previous = _snapshot(src_dir)
+    while True:
+        time.sleep(interval)
+        current = _snapshot(src_dir)
+        if current == previous:
+            continue
+        # wait until the burst of writes (e.g. from an editor) is over
+        while True:
+            time.sleep(debounce)
+            settled = _snapshot(src_dir)
+            if settled == current:
+                break
+            current = settled
+        yield {
+            path for path in previous.keys() | current.keys()
+            if previous.get(path) != current.get(path)
+        }
+        previous = current
+
+
+def _snapshot(src_dir: Path) -> Dict[Path, Tuple[int, int]]:
+    snapshot = {}
+    for path in src_dir.glob("*.fnl"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
@@ -1,13 +1,102 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Callable, Dict, Iterator, Sequence, TypeVar, Optional, Tuple
-from context_manager_patma import derive, register
+from collections import abc
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Mapping, Sequence, Optional, Tuple, Union
 from . import entity_types as et
 import html
 import json
 
 
-R = TypeVar("R", bound="HtmlRender")
+class TextTransform:
+    """
+    A precompiled transformation of text that replaces some characters with
+    strings, like `str.translate`.
+
+    Transforms are composed with `then`. Compositions are cached and
+    precompiled as well, so a stack of transforms is applied in one go.
+    """
+    def __init__(self, replacements: Mapping[str, str]):
+        self.replacements = dict(replacements)
+        self._table = {ord(char): s for char, s in replacements.items()}
+        self._steps = _replacement_order(self.replacements)
+        # e.g. `nobr`, the most common transform
+        self._single = self._steps[0] if self._steps is not None and len(self._steps) == 1 else None
+
+    def __call__(self, text: str) -> str:
+        if self._single is not None:
+            return text.replace(*self._single)
+        if self._steps is None:
+            return text.translate(self._table)
+        # `str.replace` is much faster than `str.translate` with a dict, and
+        # most strings don't contain most of the characters
+        for char, replacement in self._steps:
+            if char in text:
+                text = text.replace(char, replacement)
+        return text
+
+    def then(self, other: TextTransform) -> TextTransform:
+        """Return a transform equivalent to applying `self` and then `other`"""
+        if other is IDENTITY:
+            return self
+        if self is IDENTITY:
+            return other
+        return _compose(self, other)
+
+
+@lru_cache(maxsize=1024)
+def _compose(first: TextTransform, second: TextTransform) -> TextTransform:
+    # The replacements work character by character, so the composition of
+    # two tables is a table as well
+    replacements = {char: second(s) for char, s in first.replacements.items()}
+    for char, s in second.replacements.items():
+        replacements.setdefault(char, s)
+    return TextTransform(replacements)
+
+
+def _replacement_order(replacements: Dict[str, str]) -> Optional[List[Tuple[str, str]]]:
+    """
+    Order the replacements so that they can be applied one after another:
+    a character is replaced before any replacement that contains it.
+    Returns None if there's no such order.
+    """
+    remaining = dict(replacements)
+    steps = []
+    while remaining:
+        ready = [
+            char for char in remaining
+            if not any(char in s for other, s in remaining.items() if other != char)
+        ]
+        if ready == []:
+            return None
+        for char in ready:
+            steps.append((char, remaining.pop(char)))
+    # `ready` characters don't appear in the other remaining replacements, so
+    # they must be replaced *last*
+    steps.reverse()
+    return steps
+
+
+class _HtmlEscape(TextTransform):
+    """HTML escaping: `html.escape` is faster than the replacements one by one"""
+    def __call__(self, text: str) -> str:
+        return html.escape(text)
+
+
+IDENTITY = TextTransform({})
+
+# Same as `html.escape(s, quote=True)`
+ESCAPE = _HtmlEscape({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
+
+# A piece of serialized HTML: `str`, or UTF-8 encoded `bytes` in binary mode
+Piece = Union[str, bytes]
 
 
 class HtmlRender:
@@ -17,41 +106,196 @@ class HtmlRender:
         """Render as HTML"""
         return "".join(self._text_parts())
 
+    def write_utf8(self, buffer: bytearray) -> int:
+        """
+        Append the HTML, encoded as UTF-8, to `buffer`. Static parts (tags,
+        options and raw HTML) are encoded once and copied as bytes.
+
+        Returns the number of bytes written.
+        """
+        start = len(buffer)
+        for piece in _Serializer(self, binary=True):
+            buffer += piece
+        return len(buffer) - start
+
+    def chunks(self, size: int) -> Iterator[str]:
+        """
+        Render as HTML in chunks of at least `size` characters (except for
+        the last one), without materializing the whole text.
+        """
+        buffer = []
+        buffered = 0
+        for part in self._text_parts():
+            buffer.append(part)
+            buffered += len(part)
+            if buffered >= size:
+                yield "".join(buffer)
+                buffer.clear()
+                buffered = 0
+        if buffer:
+            yield "".join(buffer)
+
+    def utf8_chunks(self, size: int) -> Iterator[bytearray]:
+        """Same as `chunks`, but the chunks are UTF-8 encoded and `size` is in bytes"""
+        buffer = bytearray()
+        for piece in _Serializer(self, binary=True):
+            buffer += piece
+            if len(buffer) >= size:
+                yield buffer
+                buffer = bytearray()
+        if buffer:
+            yield buffer
+
+    def __add__(self, other: HtmlRender) -> Concat:
+        """
+        Concatenate two elements in O(1), like a rope: neither of them is
+        copied or flattened.
+        """
+        return Concat((self, other))
+
     def _text_parts(self) -> Iterator[str]:
-        raise NotImplementedError
+        return iter(_Serializer(self))  # type: ignore
 
-    def fmap(self: R, fn: Callable[[str], str]) -> R:
-        """Apply a transformation to the textual part of HTML"""
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        """
+        Return the first piece of text of this element and push the rest of
+        it onto `serializer.stack` (in reverse order).
+
+        The pieces must be UTF-8 encoded if `serializer.binary` is set.
+        """
         raise NotImplementedError
 
 
+class _Serializer:
+    """
+    Turns an HtmlRender tree into pieces of text.
+
+    Instead of nested generators (where every piece is passed up through
+    every level of the tree), it keeps an explicit stack of strings and
+    elements that are yet to be emitted. Each piece then costs O(1)
+    amortized, and deep trees don't hit the recursion limit.
+    """
+    def __init__(self, root: HtmlRender, binary: bool = False):
+        # Besides pieces and `HtmlRender`s, the stack can hold evaluated
+        # entities, see `EntityRender`
+        self.stack: List[Union[Piece, HtmlRender, Entity]] = [root]
+        self.binary = binary
+        self.runtime: Optional[Dict[str, Entity]] = None
+        # applied to the text after escaping it, see `Transformed`
+        self.transform = IDENTITY
+        # set inside inline elements, which can only contain inline elements:
+        # entities that are evaluated while they're serialized check it
+        self.inline = False
+
+    def __iter__(self) -> Iterator[Piece]:
+        stack = self.stack
+        pop = stack.pop
+        while stack:
+            item = pop()
+            if isinstance(item, (str, bytes)):
+                yield item
+            elif (piece := item._unfold(self)):
+                yield piece
+
+    def text(self, text: str) -> Piece:
+        """Escape (and encode) a string"""
+        text = html.escape(text)
+        if self.transform is not IDENTITY:
+            text = self.transform(text)
+        return text.encode("utf-8") if self.binary else text
+
+    def raw(self, text: str) -> Piece:
+        """Encode a string that shouldn't be escaped"""
+        return text.encode("utf-8") if self.binary else text
+
+    def push_transform(self, transform: TextTransform):
+        """Apply `transform` to the text until the current element ends"""
+        self.stack.append(_RestoreTransform(self.transform))
+        self.transform = transform.then(self.transform)
+
+    def enter_inline(self):
+        """Set `inline` until the current element ends"""
+        if not self.inline:
+            self.inline = True
+            self.stack.append(_END_INLINE)
+
+
+@dataclass
+class _RestoreTransform(HtmlRender):
+    """Marks the end of a `Transformed` element on the serializer stack"""
+    transform: TextTransform
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.transform = self.transform
+        return ""
+
+
+class _EndInline(HtmlRender):
+    """Marks the end of the outermost inline element on the serializer stack"""
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.inline = False
+        return ""
+
+
+_END_INLINE = _EndInline()
+
+
 @dataclass
 class RawHtml(HtmlRender):
-    """Renders `content` as is (without escaping)"""
-    content: str
+    """
+    Renders `content` as is (without escaping).
 
-    def _text_parts(self) -> Iterator[str]:
-        yield self.content
+    Text transformations don't apply to raw HTML: we can't know what parts of
+    it are text.
+    """
+    content: str
+    _encoded: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
 
-    def fmap(self, fn: Callable[[str], str]):
-        # We can't know what parts of raw HTML are text, so do nothing
-        return self
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        if not serializer.binary:
+            return self.content
+        if self._encoded is None:
+            self._encoded = self.content.encode("utf-8")
+        return self._encoded
 
 
 @dataclass
 class SafeHtml(HtmlRender):
     """Renders the escaped version of `unsafe_content`."""
     unsafe_content: str
-    _after_escape: Callable[[str], str] = staticmethod(lambda s: s)  # type: ignore
 
-    def _text_parts(self) -> Iterator[str]:
-        yield self._after_escape(html.escape(self.unsafe_content, quote=True))
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return serializer.text(self.unsafe_content)
 
-    def fmap(self, fn: Callable[[str], str]):
-        return SafeHtml(
-            self.unsafe_content,
-            _after_escape=lambda s: fn(self._after_escape(s))
-        )
+
+@dataclass
+class Transformed(HtmlRender):
+    """
+    Renders `content`, applying `transform` to its textual part.
+
+    The transformation happens during serialization, so the tree isn't copied.
+    """
+    content: HtmlRender
+    transform: TextTransform
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.push_transform(self.transform)
+        serializer.stack.append(self.content)
+        return ""
+
+
+@dataclass
+class InlineRender(HtmlRender):
+    """
+    Renders `content`, which is an inline element: the entities in it that
+    are evaluated while they're serialized must be inline too.
+    """
+    content: HtmlRender
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.enter_inline()
+        serializer.stack.append(self.content)
+        return ""
 
 
 @dataclass
@@ -67,26 +311,16 @@ class HtmlTag(HtmlRender):
     options: str
     content: Sequence[HtmlRender]
 
-    def _text_parts(self) -> Iterator[str]:
-        yield "<"
-        yield self.tag
-        if self.options == "":
-            yield ""
-        else:
-            yield " " + self.options
-        yield ">"
-        for r in self.content:
-            yield from r._text_parts()
-        yield "</"
-        yield self.tag
-        yield ">"
-
-    def fmap(self, fn: Callable[[str], str]):
-        return HtmlTag(
-            self.tag,
-            self.options,
-            [r.fmap(fn) for r in self.content]
-        )
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        (opening, closing) = _tag_pieces(self.tag, self.options, serializer.binary)
+        stack = serializer.stack
+        stack.append(closing)
+        stack.extend(reversed(self.content))
+        return opening
+
+    def with_appended(self, render: HtmlRender) -> HtmlTag:
+        """Return the same tag with `render` added to the end, in O(1)"""
+        return HtmlTag(self.tag, self.options, (Concat(self.content), render))
 
 
 @dataclass
@@ -96,19 +330,8 @@ class ClosedHtmlTag(HtmlRender):
     options: str
     include_slash: bool
 
-    def _text_parts(self) -> Iterator[str]:
-        yield "<"
-        yield self.tag
-        if self.options == "":
-            yield ""
-        else:
-            yield " " + self.options
-        if self.include_slash:
-            yield " /"
-        yield ">"
-
-    def fmap(self, fn: Callable[[str], str]):
-        return self
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return _closed_tag_piece(self.tag, self.options, self.include_slash, serializer.binary)
 
 
 @dataclass
@@ -121,12 +344,59 @@ class Concat(HtmlRender):
     """
     children: Sequence[HtmlRender]
 
-    def _text_parts(self) -> Iterator[str]:
-        for r in self.children:
-            yield from r._text_parts()
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.stack.extend(reversed(self.children))
+        return ""
 
-    def fmap(self, fn: Callable[[str], str]):
-        return Concat([r.fmap(fn) for r in self.children])
+
+@dataclass
+class EntityRender(HtmlRender):
+    """
+    Renders an evaluated entity straight into text.
+
+    The built-in entities are serialized directly, without building an
+    intermediate HtmlRender tree. Other entities are rendered with their
+    `render` method when the serializer gets to them.
+    """
+    entity: Entity
+    runtime: Dict[str, Entity]
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        if serializer.runtime is not self.runtime:
+            serializer.stack.append(_RestoreRuntime(serializer.runtime))
+            serializer.runtime = self.runtime
+        serializer.stack.append(self.entity)
+        return ""
+
+
+@dataclass
+class _RestoreRuntime(HtmlRender):
+    """Marks the end of an `EntityRender` element on the serializer stack"""
+    runtime: Optional[Dict[str, Entity]]
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.runtime = self.runtime
+        return ""
+
+
+# The same tags with the same options are rendered over and over again, so
+# their text (and UTF-8 encoding) is only built once:
+
+@lru_cache(maxsize=4096)
+def _tag_pieces(tag: str, options: str, binary: bool) -> Tuple[Piece, Piece]:
+    opening = f"<{tag}>" if options == "" else f"<{tag} {options}>"
+    closing = f"</{tag}>"
+    if binary:
+        return opening.encode("utf-8"), closing.encode("utf-8")
+    return opening, closing
+
+
+@lru_cache(maxsize=1024)
+def _closed_tag_piece(tag: str, options: str, include_slash: bool, binary: bool) -> Piece:
+    options = "" if options == "" else " " + options
+    slash = " /" if include_slash else ""
+    text = f"<{tag}{options}{slash}>"
+    return text.encode("utf-8") if binary else text
 
 
 class Entity:
@@ -155,12 +425,19 @@ class Entity:
         """Evaluate an expression until it settles on a final value"""
         return self
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        """
+        Serialize an evaluated entity, see `EntityRender` and
+        `HtmlRender._unfold`. By default, the entity is rendered as usual.
+        """
+        serializer.stack.append(self.render(serializer.runtime))
+        return ""
+
     def as_source(self) -> str:
         """Represent the expressions as source, if possible"""
         return f"< {self!r} >"
 
 
-@derive("Quoted", "subexpression")
 @dataclass(frozen=True, eq=True)
 class Quoted(Entity):
     subexpression: Entity
@@ -176,7 +453,6 @@ class Quoted(Entity):
         return f"&{self.subexpression.as_source()}"
 
 
-@derive("Name", "name")
 @dataclass(frozen=True, eq=True)
 class Name(Entity):
     """Represents getting a global variable by its name"""
@@ -203,14 +479,15 @@ class CallError(Exception):
         self.args = (msg, propagate)
 
 
-@register("Sexpr")
 @dataclass(frozen=True)
 class Sexpr(Entity):
     """Represents a function call"""
     fn: Entity
     args: Tuple[Entity, ...]
 
-    _position: Optional[Tuple[int, int]] = None  # (line, column)
+    # (line, column), not part of the equality or the hash: the same call at
+    # another place in the source is equal
+    _position: Optional[Tuple[int, int]] = field(default=None, compare=False)
 
     def __eq__(self, other):
         if not isinstance(other, Sexpr):
@@ -280,11 +557,13 @@ class Integer(Entity):
     def render_inline(self, runtime) -> HtmlRender:
         return RawHtml(str(self.value))
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return serializer.raw(str(self.value))
+
     def as_source(self) -> str:
         return str(self.value)
 
 
-@derive("String", "value")
 @dataclass(frozen=True, eq=True)
 class String(Entity):
     value: str
@@ -294,10 +573,46 @@ class String(Entity):
     def render_inline(self, runtime):
         return SafeHtml(self.value)
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return serializer.text(self.value)
+
     def as_source(self) -> str:
         return json.dumps(self.value)
 
 
+@dataclass(frozen=True, eq=True)
+class FnlList(Entity):
+    """
+    A list of evaluated entities, e.g. the result of `(list 1 2 3)`.
+
+    `items` is a tuple, or a `LazyRange`, which creates the integers as
+    they're looked up.
+    """
+    items: Sequence[Entity]
+
+    ty = et.TList()
+
+    def as_source(self) -> str:
+        if isinstance(self.items, LazyRange):
+            numbers = self.items.numbers
+            return f"(range {numbers.start} {numbers.stop})"
+        return "(list" + "".join(" " + item.as_source() for item in self.items) + ")"
+
+
+@dataclass(frozen=True, eq=True)
+class LazyRange(abc.Sequence):
+    """The integers of `numbers`, made on demand"""
+    numbers: range
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LazyRange(self.numbers[index])
+        return Integer(self.numbers[index])
+
+
 @dataclass(frozen=True, eq=True)
 class InlineTag(Entity):
     """Represents an inline HTML tag"""
@@ -314,6 +629,10 @@ class InlineTag(Entity):
             [c.render_inline(runtime) for c in self.children]  # type: ignore
         )
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.enter_inline()
+        return _unfold_tag(self, serializer)
+
     def evaluate(self, runtime):
         return InlineTag(self.tag, self.options, tuple(e.evaluate(runtime) for e in self.children))
 
@@ -337,10 +656,21 @@ class BlockTag(Entity):
             [c.render(runtime) for c in self.children]
         )
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return _unfold_tag(self, serializer)
+
     def evaluate(self, runtime):
         return BlockTag(self.tag, self.options, tuple(e.evaluate(runtime) for e in self.children))
 
 
+def _unfold_tag(tag: Union[InlineTag, BlockTag], serializer: _Serializer) -> Piece:
+    (opening, closing) = _tag_pieces(tag.tag, tag.options, serializer.binary)
+    stack = serializer.stack
+    stack.append(closing)
+    stack.extend(reversed(tag.children))
+    return opening
+
+
 @dataclass(frozen=True, eq=True)
 class ClosedInlineTag(Entity):
     """Represents a closed inline HTML tag"""
@@ -353,6 +683,9 @@ class ClosedInlineTag(Entity):
     def render_inline(self, runtime):
         return ClosedHtmlTag(self.tag, self.options, self.include_slash)
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return _closed_tag_piece(self.tag, self.options, self.include_slash, serializer.binary)
+
 
 @dataclass(frozen=True, eq=True)
 class ClosedBlockTag(Entity):
@@ -366,6 +699,9 @@ class ClosedBlockTag(Entity):
     def render_block(self, runtime):
         return ClosedHtmlTag(self.tag, self.options, self.include_slash)
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return _closed_tag_piece(self.tag, self.options, self.include_slash, serializer.binary)
+
 
 @dataclass(frozen=True, eq=True)
 class InlineRaw(Entity):
@@ -377,6 +713,9 @@ class InlineRaw(Entity):
     def render_inline(self, runtime):
         return RawHtml(self.html)
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return serializer.raw(self.html)
+
 
 @dataclass(frozen=True, eq=True)
 class BlockRaw(Entity):
@@ -388,6 +727,9 @@ class BlockRaw(Entity):
     def render_block(self, runtime):
         return RawHtml(self.html)
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        return serializer.raw(self.html)
+
 
 @dataclass(frozen=True, eq=True)
 class InlineConcat(Entity):
@@ -399,6 +741,11 @@ class InlineConcat(Entity):
     def render_inline(self, runtime):
         return Concat([e.render_inline(runtime) for e in self.children])  # type: ignore
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.enter_inline()
+        serializer.stack.extend(reversed(self.children))
+        return ""
+
     def evaluate(self, runtime):
         return InlineConcat(tuple(e.evaluate(runtime) for e in self.children))
 
@@ -413,10 +760,76 @@ class BlockConcat(Entity):
     def render_block(self, runtime):
         return Concat([e.render(runtime) for e in self.children])
 
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.stack.extend(reversed(self.children))
+        return ""
+
     def evaluate(self, runtime):
         return BlockConcat(tuple(e.evaluate(runtime) for e in self.children))
 
 
+@dataclass(frozen=True, eq=True)
+class _Map(Entity):
+    """
+    `fn` applied to each of `items`, concatenated. The calls are evaluated
+    one at a time while the result is serialized, so the elements of a long
+    `range` are never all in memory.
+    """
+    fn: Entity
+    items: Sequence[Entity]
+
+    def evaluate_call(self, index: int, runtime) -> Entity:
+        return Sexpr(self.fn, (self.items[index],)).evaluate(runtime)
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.stack.append(_MapCursor(self, 0))
+        return ""
+
+
+@dataclass(frozen=True, eq=True)
+class InlineMap(_Map):
+    """`map` over a list with a function that returns inline elements"""
+    ty = et.TInline()
+
+    def render_inline(self, runtime):
+        return Concat([
+            self.evaluate_call(i, runtime).render_inline(runtime)  # type: ignore
+            for i in range(len(self.items))
+        ])
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.enter_inline()
+        return super()._unfold(serializer)
+
+
+@dataclass(frozen=True, eq=True)
+class BlockMap(_Map):
+    """`map` over a list with a function that returns block elements"""
+    ty = et.TBlock()
+
+    def render_block(self, runtime):
+        return Concat([
+            self.evaluate_call(i, runtime).render(runtime)
+            for i in range(len(self.items))
+        ])
+
+
+@dataclass
+class _MapCursor(HtmlRender):
+    """The next call of a `map` on the serializer stack"""
+    calls: _Map
+    index: int
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        if self.index == len(self.calls.items):
+            return ""
+        result = self.calls.evaluate_call(self.index, serializer.runtime)
+        self.index += 1
+        serializer.stack.append(self)
+        serializer.stack.append(result)
+        return ""
+
+
 @dataclass(frozen=True, eq=True)
 class Function(Entity):
     """
@@ -484,11 +897,11 @@ class Function(Entity):
 @dataclass(frozen=True, eq=True)
 class AfterRender(Entity):
     """
-    Apply the function to the rendered content of an element.
+    Apply the transformation to the rendered content of an element.
     For example, the `nobr` function replaces every ` ` with `&nbsp;`
     """
     subexpr: Entity
-    fn: Callable[[str], str]
+    fn: TextTransform
 
     @property
     def ty(self):
@@ -498,23 +911,25 @@ class AfterRender(Entity):
         return AfterRender(self.subexpr.evaluate(runtime), self.fn)
 
     def render(self, runtime):
-        return self.subexpr.render(runtime).fmap(self.fn)
+        return Transformed(self.subexpr.render(runtime), self.fn)
+
+    def _unfold(self, serializer: _Serializer) -> Piece:
+        serializer.push_transform(self.fn)
+        serializer.stack.append(self.subexpr)
+        return ""
 
     # whether an Entity is renderable as inline or as block is determined
     # by it having a render_inline or render_block attribute, so this is
     # necessary to preserve strong typing:
     def __getattr__(self, attr):
-        if attr == "render_inline":
-            if hasattr(self.subexpr, "render_inline"):
-                return self.subexpr.render_inline  # type: ignore
-        elif attr == "render_block":
-            if hasattr(self.subexpr, "render_block"):
-                return self.subexpr.render_block  # type: ignore
-        else:
-            raise AttributeError(attr)
+        if attr == "render_inline" and hasattr(self.subexpr, "render_inline"):
+            return self._render_inline
+        if attr == "render_block" and hasattr(self.subexpr, "render_block"):
+            return self._render_block
+        raise AttributeError(attr)
 
     def _render_inline(self, runtime):
-        return self.subexpr.render_inline(runtime).fmap(self.fn)  # type: ignore
+        return Transformed(self.subexpr.render_inline(runtime), self.fn)  # type: ignore
 
     def _render_block(self, runtime):
-        return self.subexpr.render_block(runtime).fmap(self.fn)  # type: ignore
+        return Transformed(self.subexpr.render_block(runtime), self.fn)  # type: ignore
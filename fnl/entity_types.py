@@ -89,9 +89,10 @@ class TQuoted(EntityType):
     parameter: EntityType
 
     def match(self, value: "e.Entity") -> bool:
-        if super().match(value):
+        # checked first: the type of a long quoted list is expensive to build
+        if isinstance(value, e.Quoted) and self.parameter.match(value.subexpression):
             return True
-        return isinstance(value, e.Quoted) and self.parameter.match(value.subexpression)
+        return super().match(value)
 
     def signature(self) -> str:
         return f"&[{self.parameter.signature()}]"
@@ -111,6 +112,13 @@ class TStr(EntityType):
         return "str"
 
 
+@dataclass(frozen=True, eq=True)
+class TList(EntityType):
+    """The `list` type. The elements aren't checked, so it's matched in O(1)"""
+    def signature(self) -> str:
+        return "list"
+
+
 @dataclass(frozen=True, eq=True)
 class TInline(EntityType):
     """The `inline` type -- an inline HTML element"""
@@ -0,0 +1,87 @@
+"""
+HTTP entity tags for rendered pages.
+
+There are two kinds of tags:
+
+- `content_etag` is a strong ETag of the rendered bytes. `ETagStream`
+  computes it while the output is being streamed, so the page doesn't need
+  to be hashed a second time.
+- `input_etag` only depends on the source and the runtime, including the
+  values captured by the extensions. If the inputs haven't changed, a
+  conditional request can be answered with `304 Not Modified` without
+  rendering the page at all. This is only sound if the extensions are
+  deterministic: pass anything else that the output depends on (e.g. global
+  variables) as `salt`. If the runtime can't be fingerprinted, there's no
+  input ETag, and the `content_etag` should be used instead.
+"""
+import hashlib
+from typing import Iterable, Iterator, Mapping, Optional, Tuple, Union
+from . import definitions
+from . import entities as e
+from .fingerprint import runtime_fingerprint
+
+
+def _new_hash():
+    return hashlib.sha256()
+
+
+def _format(hash_object) -> str:
+    return '"' + hash_object.hexdigest() + '"'
+
+
+def content_etag(data: Union[bytes, bytearray, memoryview]) -> str:
+    """Strong ETag of the rendered UTF-8 bytes"""
+    hash_object = _new_hash()
+    hash_object.update(data)
+    return _format(hash_object)
+
+
+class ETagStream:
+    """
+    Passes UTF-8 chunks through, hashing them along the way. When the
+    iteration is over, `etag` is the same as the `content_etag` of the
+    concatenated chunks.
+
+    >>> stream = ETagStream(fnl.iter_html_utf8(source))
+    >>> for chunk in stream:
+    ...     response.write(chunk)
+    >>> stream.etag
+    """
+    def __init__(self, chunks: Iterable[Union[bytes, bytearray]]):
+        self._chunks = chunks
+        self._hash = _new_hash()
+        self._etag: Optional[str] = None
+
+    def __iter__(self) -> Iterator[Union[bytes, bytearray]]:
+        for chunk in self._chunks:
+            self._hash.update(chunk)
+            yield chunk
+        self._etag = _format(self._hash)
+
+    @property
+    def etag(self) -> str:
+        if self._etag is None:
+            raise RuntimeError("The ETag is only known after the whole output is streamed")
+        return self._etag
+
+
+def input_etag(
+        source: str,
+        extensions: Union[Iterable[Tuple[str, e.Entity]], Mapping[str, e.Entity]] = (),
+        salt: bytes = b"",
+) -> Optional[str]:
+    """
+    ETag of the inputs of `fnl.html(source, extensions)`: the source, the
+    built-ins, the extensions and an arbitrary `salt`. None if the
+    extensions can't be fingerprinted, see `fnl.fingerprint.runtime_fingerprint`.
+    """
+    runtime = {**definitions.BUILTINS}
+    runtime.update(extensions)  # type: ignore -- Pyright, issue 1119
+    if (runtime_part := runtime_fingerprint(runtime)) is None:
+        return None
+
+    hash_object = _new_hash()
+    for part in (source.encode("utf-8"), runtime_part, salt):
+        hash_object.update(len(part).to_bytes(8, "little"))
+        hash_object.update(part)
+    return 'W/' + _format(hash_object)
@@ -0,0 +1,291 @@
+"""
+Structural fingerprints of entities.
+
+A fingerprint is a digest of the type and contents of an entity and all of
+its children, so two entities have the same fingerprint exactly when they
+are structurally equal (up to hash collisions of a 128-bit digest).
+"""
+import dataclasses
+import functools
+import hashlib
+import types
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Set, Tuple
+from . import entities as e
+
+
+DIGEST_SIZE = 16
+
+
+class Fingerprinter:
+    """
+    Computes fingerprints, remembering them for the entities it has seen.
+
+    Only the entity types from `fnl.entities` can be fingerprinted. Other
+    types (e.g. extensions with hidden state), entities for which `exclude`
+    returns True and all of their parents get `None` as their fingerprint.
+
+    The memo is keyed by `id`, so a `Fingerprinter` should only be used
+    while the entities are alive, e.g. during a single render.
+    """
+    def __init__(self, exclude: Optional[Callable[[e.Entity], bool]] = None):
+        self.exclude = exclude
+        self._memo: Dict[int, Tuple[Optional[bytes], int]] = {}
+
+    def fingerprint(self, entity: e.Entity) -> Optional[bytes]:
+        return self.fingerprint_and_size(entity)[0]
+
+    def fingerprint_and_size(self, entity: e.Entity) -> Tuple[Optional[bytes], int]:
+        """Return the fingerprint and the number of entities in the subtree"""
+        if (known := self._memo.get(id(entity))) is not None:
+            return known
+        result = self._compute(entity)
+        self._memo[id(entity)] = result
+        return result
+
+    def _compute(self, entity: e.Entity) -> Tuple[Optional[bytes], int]:
+        if self.exclude is not None and self.exclude(entity):
+            return None, 1
+        encoder = _ENCODERS.get(type(entity))
+        if encoder is None:
+            return None, 1
+
+        fields, children = encoder(entity)
+        digest = hashlib.blake2b(type(entity).__name__.encode(), digest_size=DIGEST_SIZE)
+        for field in fields:
+            _feed(digest, field.encode("utf-8"))
+        size = 1
+        for child in children:
+            (child_digest, child_size) = self.fingerprint_and_size(child)
+            if child_digest is None:
+                return None, size + child_size
+            _feed(digest, child_digest)
+            size += child_size
+        return digest.digest(), size
+
+
+def fingerprint(
+        entity: e.Entity,
+        exclude: Optional[Callable[[e.Entity], bool]] = None
+) -> Optional[bytes]:
+    """Return the fingerprint of an entity, or None if it can't be fingerprinted"""
+    return Fingerprinter(exclude).fingerprint(entity)
+
+
+def _feed(digest, data: bytes):
+    # length-prefixed, so that ("ab", "c") and ("a", "bc") are different
+    digest.update(len(data).to_bytes(8, "little"))
+    digest.update(data)
+
+
+Encoded = Tuple[Iterable[str], Iterable[e.Entity]]
+
+
+def _tag(entity) -> Encoded:
+    return (entity.tag, entity.options), entity.children
+
+
+def _closed_tag(entity) -> Encoded:
+    return (entity.tag, entity.options, str(entity.include_slash)), ()
+
+
+def _after_render(entity: e.AfterRender) -> Encoded:
+    replacements = sorted(entity.fn.replacements.items())
+    return [part for item in replacements for part in item], (entity.subexpr,)
+
+
+_ENCODERS: Dict[type, Callable[..., Encoded]] = {
+    e.String: lambda entity: ((entity.value,), ()),
+    e.Integer: lambda entity: ((str(entity.value),), ()),
+    e.Name: lambda entity: ((entity.name,), ()),
+    e.Quoted: lambda entity: ((), (entity.subexpression,)),
+    e.Sexpr: lambda entity: ((), (entity.fn, *entity.args)),
+    e.InlineRaw: lambda entity: ((entity.html,), ()),
+    e.BlockRaw: lambda entity: ((entity.html,), ()),
+    e.InlineTag: _tag,
+    e.BlockTag: _tag,
+    e.ClosedInlineTag: _closed_tag,
+    e.ClosedBlockTag: _closed_tag,
+    e.InlineConcat: lambda entity: ((), entity.children),
+    e.BlockConcat: lambda entity: ((), entity.children),
+    e.AfterRender: _after_render,
+}
+
+
+# Bump this when a change in `fnl` changes the output for the same input,
+# so that the fingerprints computed by the older versions are invalidated
+FORMAT_VERSION = 2
+
+
+def runtime_fingerprint(runtime: Mapping[str, e.Entity]) -> Optional[bytes]:
+    """
+    Fingerprint of a runtime (the built-ins and the extensions), which
+    changes when a name is added, removed or bound to something else, or
+    when the state of a value changes.
+
+    Functions are fingerprinted by their signatures and their
+    implementations: the code and the values captured in closures and
+    default arguments. Other entities are fingerprinted by their structure,
+    or by their state: the compared fields of a dataclass, or the attributes
+    of another object.
+
+    Returns None if the runtime holds a value that can't be fingerprinted
+    (e.g. a lock, a file or an object implemented in C). Note that the
+    global variables read by the implementations aren't part of the
+    fingerprint.
+    """
+    digest = hashlib.blake2b(FORMAT_VERSION.to_bytes(4, "little"), digest_size=DIGEST_SIZE)
+    state = _StateFingerprinter()
+    for name in sorted(runtime):
+        value = state.value(runtime[name])
+        if value is None:
+            return None
+        _feed(digest, name.encode("utf-8"))
+        _feed(digest, value)
+    return digest.digest()
+
+
+def input_fingerprint(
+        source: bytes,
+        runtime: Mapping[str, e.Entity],
+        salt: bytes = b"",
+) -> Optional[bytes]:
+    """
+    Fingerprint of all the inputs of a render: the source, the runtime and a
+    `salt`, or None if the runtime can't be fingerprinted
+    """
+    if (runtime_part := runtime_fingerprint(runtime)) is None:
+        return None
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in (source, runtime_part, salt):
+        _feed(digest, part)
+    return digest.digest()
+
+
+def _digest(*parts: bytes) -> bytes:
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        _feed(digest, part)
+    return digest.digest()
+
+
+def _qualified_name(value) -> bytes:
+    return f"{getattr(value, '__module__', None)}.{value.__qualname__}".encode("utf-8")
+
+
+_PLAIN_TYPES = (type(None), bool, int, float, complex, str, bytes, range)
+
+
+class _StateFingerprinter:
+    """
+    Fingerprints the values that the output of a render can depend on.
+    The state can change between renders, so nothing is remembered between
+    calls of `runtime_fingerprint` except the fingerprints of code objects.
+    """
+    def __init__(self):
+        self.entities = Fingerprinter()
+        self._in_progress: Set[int] = set()
+
+    def value(self, value: Any) -> Optional[bytes]:
+        kind = type(value)
+        if kind in _PLAIN_TYPES:
+            return _digest(kind.__name__.encode(), repr(value).encode("utf-8"))
+        if kind in _ENCODERS:
+            return self.entities.fingerprint(value)
+        if id(value) in self._in_progress:
+            # a cycle, e.g. a recursive closure: the value is already being
+            # fingerprinted further up
+            return _digest(b"cycle", _qualified_name(kind))
+        self._in_progress.add(id(value))
+        try:
+            return self._compound(value)
+        finally:
+            self._in_progress.discard(id(value))
+
+    def values(self, *parts: Any) -> Optional[bytes]:
+        digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        for part in parts:
+            if (fingerprint := self.value(part)) is None:
+                return None
+            _feed(digest, fingerprint)
+        return digest.digest()
+
+    def _compound(self, value: Any) -> Optional[bytes]:
+        kind = type(value)
+        if isinstance(value, e.Function):
+            overloads = [
+                (signature.signature(), implementation)
+                for signature, implementation in value.overloads.items()
+            ]
+            return self.values(b"Function", value._docstring_source, *overloads)
+        if kind in (tuple, list):
+            return self.values(kind.__name__.encode(), *value)
+        if kind in (set, frozenset):
+            return self._unordered(b"set", value)
+        if kind is dict:
+            return self._unordered(b"dict", value.items())
+        if kind is types.FunctionType:
+            closure = [_cell_contents(cell) for cell in value.__closure__ or ()]
+            return self.values(
+                b"function", _code_fingerprint(value.__code__),
+                value.__defaults__, value.__kwdefaults__, *closure,
+            )
+        if kind is types.MethodType:
+            return self.values(b"method", value.__func__, value.__self__)
+        if kind is types.BuiltinFunctionType:
+            owner = value.__self__
+            if owner is None or isinstance(owner, types.ModuleType):
+                return _digest(b"builtin", _qualified_name(value))
+            return self.values(b"builtin method", _qualified_name(value), owner)
+        if kind is functools.partial:
+            return self.values(b"partial", value.func, value.args, value.keywords)
+        if isinstance(value, type):
+            return _digest(b"type", _qualified_name(value))
+        if isinstance(value, types.ModuleType):
+            return _digest(b"module", value.__name__.encode("utf-8"))
+        if isinstance(value, e.TextTransform):
+            return self.values(b"TextTransform", value.replacements)
+        if dataclasses.is_dataclass(value):
+            fields = [
+                getattr(value, field.name)
+                for field in dataclasses.fields(value) if field.compare
+            ]
+            return self.values(_qualified_name(kind), *fields)
+        if kind.__module__ != "builtins" and hasattr(value, "__dict__"):
+            return self.values(_qualified_name(kind), vars(value))
+        return None
+
+    def _unordered(self, name: bytes, items: Iterable[Any]) -> Optional[bytes]:
+        fingerprints = []
+        for item in items:
+            if (fingerprint := self.value(item)) is None:
+                return None
+            fingerprints.append(fingerprint)
+        return self.values(name, *sorted(fingerprints))
+
+
+class _EmptyCell:
+    pass
+
+
+def _cell_contents(cell) -> Any:
+    try:
+        return cell.cell_contents
+    except ValueError:  # a variable that isn't assigned yet
+        return _EmptyCell
+
+
+@functools.lru_cache(maxsize=4096)
+def _code_fingerprint(code: types.CodeType) -> bytes:
+    # `repr` of a nested code object includes its address, so nested code
+    # objects are fingerprinted recursively instead
+    digest = hashlib.blake2b(code.co_code, digest_size=DIGEST_SIZE)
+    _feed(digest, " ".join(code.co_names).encode("utf-8"))
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            _feed(digest, _code_fingerprint(constant))
+        elif isinstance(constant, frozenset):
+            # e.g. `x in {"a", "b"}`, the order depends on the hash seed
+            _feed(digest, repr(sorted(map(repr, constant))).encode("utf-8"))
+        else:
+            _feed(digest, repr(constant).encode("utf-8"))
+    return digest.digest()
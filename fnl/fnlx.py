@@ -1,12 +1,9 @@
 import json
-import fnl
+from functools import lru_cache
 from . import entities as e
-from . import entity_types as et
 from .definitions import fn
 
-from context_manager_patma import match
-
-from typing import Dict, List, NamedTuple, Iterable
+from typing import Dict, List, NamedTuple, Iterable, Sequence, Tuple
 from enum import Enum
 
 
@@ -27,45 +24,90 @@ class TagInfo(NamedTuple):
 
     @property
     def as_option_string(self):
-        if self.classes == []:
-            return " ".join(self.options)
-        else:
-            class_str = 'class="' + " ".join(self.classes) + '"'
-            return " ".join([class_str, *self.options])
+        return _option_string(self.classes, self.options)
+
+
+def _option_string(classes: Sequence[str], options: Sequence[str]) -> str:
+    if len(classes) == 0:
+        return " ".join(options)
+    else:
+        class_str = 'class="' + " ".join(classes) + '"'
+        return " ".join([class_str, *options])
 
 
 def parse_html_options(args: Iterable[e.Entity]):
     """Separates actual elements from HTML options: class names, ID names etc."""
+    args = tuple(args)
+    quoted = tuple(arg for arg in args if isinstance(arg, e.Quoted))
+    (classes, options, tag_kind) = _options(quoted)
+    body = [arg for arg in args if not isinstance(arg, e.Quoted)]
+    return TagInfo(list(classes), list(options), body, tag_kind)
+
+
+def _parse_tag(args: Sequence[e.Entity]) -> Tuple[str, TagKind, Tuple[e.Entity, ...]]:
+    """Return the option string, the kind and the body of a tag"""
+    quoted = tuple(arg for arg in args if isinstance(arg, e.Quoted))
+    body = tuple(arg for arg in args if not isinstance(arg, e.Quoted))
+    if quoted == ():
+        return "", TagKind.Open, body
+    (classes, options, tag_kind) = _options(quoted)
+    return _option_string(classes, options), tag_kind, body
+
+
+Options = Tuple[Tuple[str, ...], Tuple[str, ...], TagKind]
+
+
+def _options(quoted: Tuple[e.Quoted, ...]) -> Options:
+    try:
+        return _parse_options(quoted)
+    except TypeError:
+        # unhashable options (e.g. a quoted function) are rejected by the parser
+        return _parse_options_uncached(quoted)
+
+
+def _parse_options_uncached(quoted: Tuple[e.Quoted, ...]) -> Options:
     classes = []
     options = []
-    body = []
     tag_kind = TagKind.Open
-    for arg in args:
-        with match(arg) as case:
-            with case('Quoted(Name("/"))') as [m]:
+    for arg in quoted:
+        option = arg.subexpression
+        if isinstance(option, e.Name):
+            name = option.name
+            if name == "/":
                 tag_kind = TagKind.ClosedWithSlash
-
-            with case('Quoted(Name("."))') as [m]:
+            elif name == ".":
                 tag_kind = TagKind.ClosedWithoutSlash
+            elif len(name) > 1 and name[0] == ".":
+                classes.append(name[1:])
+            elif len(name) > 1 and name[0] == "#":
+                options.append(f'id="{name[1:]}"')
+            else:
+                options.append(name)
+        elif isinstance(option, e.String):
+            options.append(option.value)
+        elif (
+            isinstance(option, e.Sexpr)
+            and isinstance(option.fn, e.Name)
+            and len(option.args) == 1
+            and isinstance(option.args[0], e.String)
+        ):
+            options.append(f"{option.fn.name}={json.dumps(option.args[0].value)}")
+        else:
+            raise TypeError(f"Expected name or call, got {option}")
+    return tuple(classes), tuple(options), tag_kind
 
-            with case('Quoted(Name(Cons(".", class_name)))') as [m]:
-                classes.append(m.class_name)
-
-            with case('Quoted(Name(Cons("#", id_name)))') as [m]:
-                options.append(f'id="{m.id_name}"')
-
-            with case('Quoted(Name(name)|String(name))') as [m]:
-                options.append(m.name)
 
-            with case('Quoted(Sexpr(Name(name), String(value)))') as [m]:
-                options.append(f"{m.name}={json.dumps(m.value)}")
+# The same options (`&.box &#main`) are used over and over again in a
+# layout, so they're parsed once:
+_parse_options = lru_cache(maxsize=4096)(_parse_options_uncached)
 
-            with case('Quoted(other)') as [m]:
-                raise TypeError(f"Expected name or call, got {m.other}")
 
-            with case('element') as [m]:
-                body.append(m.element)
-    return TagInfo(classes, options, body, tag_kind)
+def _tag_name(name_arg: e.Entity) -> str:
+    if isinstance(name_arg, e.Quoted) and isinstance(name_arg.subexpression, e.Name):
+        return name_arg.subexpression.name
+    if isinstance(name_arg, e.String):
+        return name_arg.value
+    raise TypeError(f"Expected a tag name, got {name_arg}")
 
 
 @fn(exports, "+")
@@ -76,8 +118,8 @@ def div():
     Shortcut for %%(tt "b &div")%%
     """
     def _div(*args: e.Entity):
-        info = parse_html_options(args)
-        return e.BlockTag("div", info.as_option_string, tuple(info.body))  # type: ignore
+        (option_string, _kind, body) = _parse_tag(args)
+        return e.BlockTag("div", option_string, body)
 
     yield ("(λ ...&[name]|&[(name str)]|inline|block . block)", _div)
 
@@ -105,20 +147,18 @@ def block_tag():
     Creates a block element. See the 'Quoted expressions' tutorial for more info.
     """
     def _block_tag(name_arg: e.Entity, *options: e.Entity):
-        with match(name_arg) as case:
-            with case('Quoted(Name(name))|String(name)') as [m]:
-                name: str = m.name
+        name = _tag_name(name_arg)
 
         if name in _INLINE_TAGS:
             raise TypeError(f"<{name}> is an inline tag")
 
-        info = parse_html_options(options)
-        if info.kind == TagKind.ClosedWithSlash:
-            return e.ClosedBlockTag(name, info.as_option_string, include_slash=True)
-        elif info.kind == TagKind.ClosedWithoutSlash:
-            return e.ClosedBlockTag(name, info.as_option_string, include_slash=False)
+        (option_string, kind, body) = _parse_tag(options)
+        if kind == TagKind.ClosedWithSlash:
+            return e.ClosedBlockTag(name, option_string, include_slash=True)
+        elif kind == TagKind.ClosedWithoutSlash:
+            return e.ClosedBlockTag(name, option_string, include_slash=False)
         else:
-            return e.BlockTag(name, info.as_option_string, tuple(info.body))  # type: ignore
+            return e.BlockTag(name, option_string, body)
 
     yield ("(λ str|&[name] ...&[str]|&[name]|&[(name str)]|inline|block . block)", _block_tag)
 
@@ -131,20 +171,18 @@ def inline_tag():
     Creates an inline element. See the 'Quoted expressions' tutorial for more info.
     """
     def _inline_tag(name_arg: e.Entity, *options: e.Entity):
-        with match(name_arg) as case:
-            with case('Quoted(Name(name))|String(name)') as [m]:
-                name: str = m.name
+        name = _tag_name(name_arg)
 
         if name in _BLOCK_TAGS:
             raise TypeError(f"<{name}> is an inline tag")
 
-        info = parse_html_options(options)
+        (option_string, kind, body) = _parse_tag(options)
 
-        if info.kind == TagKind.ClosedWithSlash:
-            return e.ClosedInlineTag(name, info.as_option_string, include_slash=True)
-        elif info.kind == TagKind.ClosedWithoutSlash:
-            return e.ClosedInlineTag(name, info.as_option_string, include_slash=False)
+        if kind == TagKind.ClosedWithSlash:
+            return e.ClosedInlineTag(name, option_string, include_slash=True)
+        elif kind == TagKind.ClosedWithoutSlash:
+            return e.ClosedInlineTag(name, option_string, include_slash=False)
         else:
-            return e.InlineTag(name, info.as_option_string, tuple(info.body))  # type: ignore
+            return e.InlineTag(name, option_string, body)
 
     yield ("(λ str|&[name] ...&[name]|&[(name str)]|inline . inline)", _inline_tag)
@@ -0,0 +1,154 @@
+"""
+Compare two rendered HTML trees and describe the difference as patches.
+
+The trees are compared at the `HtmlTag` level. A patch replaces the inner
+HTML of one element, which is found by its structural path: the indices of
+the elements on the way to it, counting only elements (like the `children`
+property in the DOM) and starting from the container of the whole tree.
+
+Raw HTML is opaque: it can contain (or close) elements, so an element with
+raw HTML among its children is always replaced as a whole. The paths assume
+that the browser builds the DOM as the HTML is written; a client should fall
+back to a full reload when a path doesn't lead anywhere.
+
+>>> old = HtmlTag("p", "", [SafeHtml("a"), HtmlTag("b", "", [SafeHtml("b")])])
+>>> new = HtmlTag("p", "", [SafeHtml("a"), HtmlTag("b", "", [SafeHtml("c")])])
+>>> diff(old, new)
+[Patch(path=(0, 0), html='c')]
+"""
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+from . import entities as e
+
+
+@dataclass(frozen=True)
+class Patch:
+    """Replace the inner HTML of the element at `path` with `html`"""
+    path: Tuple[int, ...]
+    html: str
+
+    def as_json(self):
+        return {"path": list(self.path), "html": self.html}
+
+
+@dataclass(frozen=True)
+class _Text:
+    html: str
+    # raw HTML can contain elements, so the paths can't go past it
+    raw: bool
+
+
+@dataclass(frozen=True)
+class _Element:
+    tag: str
+    options: str
+    closed: bool
+    children: Tuple["_Node", ...]
+    inner_html: str
+    outer_html: str
+
+
+_Node = Union[_Text, _Element]
+
+
+def diff(old: e.HtmlRender, new: e.HtmlRender) -> List[Patch]:
+    """
+    Return the patches that turn the HTML of `old` into the HTML of `new`.
+
+    An empty path means that the whole content of the container is replaced.
+    """
+    patches: List[Patch] = []
+    (old_children, new_children) = (_normalize(old), _normalize(new))
+    _diff_children((), old_children, new_children, _inner_html(new_children), patches)
+    return patches
+
+
+def _diff_children(
+        path: Tuple[int, ...],
+        old: Tuple[_Node, ...],
+        new: Tuple[_Node, ...],
+        new_html: str,
+        patches: List[Patch]
+):
+    if not _same_shape(old, new):
+        patches.append(Patch(path, new_html))
+        return
+
+    element_index = 0
+    for (old_node, new_node) in zip(old, new):
+        if isinstance(old_node, _Element) and isinstance(new_node, _Element):
+            if old_node.outer_html != new_node.outer_html:
+                _diff_children(
+                    path + (element_index,),
+                    old_node.children,
+                    new_node.children,
+                    new_node.inner_html,
+                    patches,
+                )
+            element_index += 1
+
+
+def _same_shape(old: Tuple[_Node, ...], new: Tuple[_Node, ...]) -> bool:
+    """Can the differences be patched one child element at a time?"""
+    if len(old) != len(new):
+        return False
+    for (old_node, new_node) in zip(old, new):
+        if isinstance(old_node, _Text) or isinstance(new_node, _Text):
+            if old_node != new_node or old_node.raw:  # type: ignore
+                return False
+        elif (
+            (old_node.tag, old_node.options, old_node.closed)
+            != (new_node.tag, new_node.options, new_node.closed)
+        ):
+            return False
+    return True
+
+
+def _normalize(render: e.HtmlRender) -> Tuple[_Node, ...]:
+    nodes: List[_Node] = []
+    _collect(render, e.IDENTITY, nodes)
+    return _merge_text(nodes)
+
+
+def _collect(render: e.HtmlRender, transform: e.TextTransform, nodes: List[_Node]):
+    if isinstance(render, e.HtmlTag):
+        children: List[_Node] = []
+        for child in render.content:
+            _collect(child, transform, children)
+        merged = _merge_text(children)
+        inner_html = _inner_html(merged)
+        (opening, closing) = e._tag_pieces(render.tag, render.options, False)
+        nodes.append(_Element(
+            render.tag, render.options, False, merged, inner_html,
+            f"{opening}{inner_html}{closing}",
+        ))
+    elif isinstance(render, e.ClosedHtmlTag):
+        nodes.append(_Element(render.tag, render.options, True, (), "", render.as_text()))
+    elif isinstance(render, e.Concat):
+        for child in render.children:
+            _collect(child, transform, nodes)
+    elif isinstance(render, e.Transformed):
+        _collect(render.content, render.transform.then(transform), nodes)
+    elif isinstance(render, e.SafeHtml):
+        nodes.append(_Text(e.ESCAPE.then(transform)(render.unsafe_content), raw=False))
+    elif isinstance(render, e.EntityRender):
+        _collect(render.entity.render(render.runtime), transform, nodes)
+    else:
+        # RawHtml and unknown kinds of HtmlRender
+        nodes.append(_Text(render.as_text(), raw=True))
+
+
+def _merge_text(nodes: List[_Node]) -> Tuple[_Node, ...]:
+    merged: List[_Node] = []
+    for node in nodes:
+        if isinstance(node, _Text) and node.html == "":
+            continue
+        if merged and isinstance(node, _Text) and isinstance(merged[-1], _Text):
+            previous = merged.pop()
+            node = _Text(previous.html + node.html, previous.raw or node.raw)  # type: ignore
+        merged.append(node)
+    return tuple(merged)
+
+
+def _inner_html(nodes: Tuple[_Node, ...]) -> str:
+    return "".join(node.html if isinstance(node, _Text) else node.outer_html for node in nodes)
@@ -1,8 +1,21 @@
 """
 Useful matching classes for context-manager-patma
+
+Importing this module also registers the entities from `fnl.entities`, so
+that they can be used in patterns. `fnl` itself doesn't use it anymore: it
+matches with the compiled patterns of `fnl.patterns`, which use the same
+notation. This module is kept for extensions written with
+`context_manager_patma` (installed with the `patma` extra).
 """
 from collections.abc import Sequence
-from context_manager_patma import register
+from context_manager_patma import derive, register
+from . import entities as e
+
+
+derive("Quoted", "subexpression")(e.Quoted)
+derive("Name", "name")(e.Name)
+derive("String", "value")(e.String)
+register("Sexpr")(e.Sexpr)
 
 
 @register("Cons")
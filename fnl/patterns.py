@@ -0,0 +1,279 @@
+"""
+Structural patterns over entities, compiled once.
+
+The patterns use the notation of `context_manager_patma`:
+
+>>> LET_ENTRY = compile_pattern('Quoted(Sexpr(Name(name), expr))')
+>>> LET_ENTRY.match(fnl.parse('&(x 42)'))
+{'name': 'x', 'expr': Integer(value=42)}
+
+- `Quoted(p)`, `Name(p)`, `String(p)` match an entity of that type whose
+  only field matches `p`;
+- `Sexpr(f, a, b)` matches a call with exactly two arguments, and
+  `Sexpr()` matches any call;
+- `Cons(first, rest)` matches a sequence (or a string) of at least two
+  elements;
+- `Seq(a, b)` matches a sequence of exactly two elements;
+- `Pi(a, b)` matches a value matching both `a` and `b`;
+- `"text"` matches an equal string, `p | q` matches either, `_` matches
+  anything and any other name captures the value.
+
+A pattern string is parsed once into a tree of closures. `Cons` doesn't
+copy the rest of the sequence: it passes a view of it down, which is only
+copied if it gets captured.
+"""
+import json
+import re
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+from . import entities as e
+
+
+# (value, captures) -> whether the value matched, filling in the captures
+Matcher = Callable[[Any, Dict[str, Any]], bool]
+
+
+class Pattern:
+    def __init__(self, source: str, matcher: Matcher):
+        self.source = source
+        self._matcher = matcher
+
+    def match(self, value: Any) -> Optional[Dict[str, Any]]:
+        """Return the captured values, or None if `value` doesn't match"""
+        captures: Dict[str, Any] = {}
+        if self._matcher(value, captures):
+            return captures
+        return None
+
+    def __repr__(self):
+        return f"Pattern({self.source!r})"
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(source: str) -> Pattern:
+    parser = _Parser(source)
+    matcher = parser.alternatives()
+    parser.expect(None)
+    return Pattern(source, matcher)
+
+
+def match(source: str, value: Any) -> Optional[Dict[str, Any]]:
+    return compile_pattern(source).match(value)
+
+
+class _View:
+    """The elements of `items` from `start` on, without copying them"""
+    __slots__ = ("items", "start")
+
+    def __init__(self, items, start: int):
+        self.items = items
+        self.start = start
+
+    def __len__(self):
+        return len(self.items) - self.start
+
+    def __getitem__(self, index: int):
+        return self.items[self.start + index]
+
+    def materialize(self):
+        return self.items[self.start:]
+
+
+def _is_sequence(value) -> bool:
+    return isinstance(value, (Sequence, _View))
+
+
+def _materialize(value):
+    return value.materialize() if isinstance(value, _View) else value
+
+
+# Matchers
+
+def _capture(name: str) -> Matcher:
+    def _match(value, captures):
+        captures[name] = _materialize(value)
+        return True
+    return _match
+
+
+def _anything(value, captures):
+    return True
+
+
+def _literal(text: str) -> Matcher:
+    def _match(value, captures):
+        if isinstance(value, _View):
+            items = value.items
+            return (
+                isinstance(items, str)
+                and len(items) - value.start == len(text)
+                and items.startswith(text, value.start)
+            )
+        return isinstance(value, str) and value == text
+    return _match
+
+
+def _either(alternatives: List[Matcher]) -> Matcher:
+    def _match(value, captures):
+        for alternative in alternatives:
+            attempt: Dict[str, Any] = {}
+            if alternative(value, attempt):
+                captures.update(attempt)
+                return True
+        return False
+    return _match
+
+
+def _field(cls: type, attribute: str) -> Callable[[List[Matcher]], Matcher]:
+    def _compile(subpatterns):
+        if len(subpatterns) != 1:
+            raise ValueError(f"{cls.__name__} expects 1 subpattern, got {len(subpatterns)}")
+        [subpattern] = subpatterns
+
+        def _match(value, captures):
+            return isinstance(value, cls) and subpattern(getattr(value, attribute), captures)
+        return _match
+    return _compile
+
+
+def _sexpr(subpatterns: List[Matcher]) -> Matcher:
+    if subpatterns == []:  # Sexpr() == "any Sexpr"
+        return lambda value, captures: isinstance(value, e.Sexpr)
+
+    (fn_pattern, *arg_patterns) = subpatterns
+    arity = len(arg_patterns)
+
+    def _match(value, captures):
+        if not isinstance(value, e.Sexpr) or len(value.args) != arity:
+            return False
+        if not fn_pattern(value.fn, captures):
+            return False
+        args = value.args
+        for i in range(arity):
+            if not arg_patterns[i](args[i], captures):
+                return False
+        return True
+    return _match
+
+
+def _cons(subpatterns: List[Matcher]) -> Matcher:
+    if len(subpatterns) != 2:
+        raise ValueError(f"Cons expects 2 subpatterns, got {len(subpatterns)}")
+    (first_pattern, rest_pattern) = subpatterns
+
+    def _match(value, captures):
+        if not _is_sequence(value) or len(value) < 2:
+            return False
+        if not first_pattern(value[0], captures):
+            return False
+        if isinstance(value, _View):
+            rest = _View(value.items, value.start + 1)
+        else:
+            rest = _View(value, 1)
+        return rest_pattern(rest, captures)
+    return _match
+
+
+def _seq(subpatterns: List[Matcher]) -> Matcher:
+    length = len(subpatterns)
+
+    def _match(value, captures):
+        if not _is_sequence(value) or len(value) != length:
+            return False
+        for i in range(length):
+            if not subpatterns[i](value[i], captures):
+                return False
+        return True
+    return _match
+
+
+def _pi(subpatterns: List[Matcher]) -> Matcher:
+    def _match(value, captures):
+        for subpattern in subpatterns:
+            if not subpattern(value, captures):
+                return False
+        return True
+    return _match
+
+
+_CONSTRUCTORS: Dict[str, Callable[[List[Matcher]], Matcher]] = {
+    "Quoted": _field(e.Quoted, "subexpression"),
+    "Name": _field(e.Name, "name"),
+    "String": _field(e.String, "value"),
+    "Sexpr": _sexpr,
+    "Cons": _cons,
+    "Seq": _seq,
+    "Pi": _pi,
+}
+
+
+# Parsing
+
+_TOKEN = re.compile(
+    r'\s*(?:'
+    r'(?P<string>"(?:[^"\\]|\\.)*")'
+    r'|(?P<name>[A-Za-z_][A-Za-z0-9_]*)'
+    r'|(?P<punct>[(),|])'
+    r')'
+)
+
+
+class _Parser:
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = []
+        position = 0
+        while source[position:].strip():
+            token = _TOKEN.match(source, position)
+            if token is None:
+                raise ValueError(f"Invalid pattern {source!r} at position {position}")
+            self.tokens.append((token.lastgroup, token[token.lastgroup]))
+            position = token.end()
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][1]
+        return None
+
+    def next(self):
+        if self.position >= len(self.tokens):
+            raise ValueError(f"Unexpected end of pattern {self.source!r}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, text: Optional[str]):
+        if self.peek() != text:
+            expected = text or "end of pattern"
+            raise ValueError(f"Expected {expected} in {self.source!r}, got {self.peek()}")
+        if text is not None:
+            self.position += 1
+
+    def alternatives(self) -> Matcher:
+        alternatives = [self.primary()]
+        while self.peek() == "|":
+            self.position += 1
+            alternatives.append(self.primary())
+        return alternatives[0] if len(alternatives) == 1 else _either(alternatives)
+
+    def primary(self) -> Matcher:
+        (kind, text) = self.next()
+        if kind == "string":
+            return _literal(json.loads(text))
+        if kind != "name":
+            raise ValueError(f"Unexpected {text!r} in {self.source!r}")
+        if self.peek() != "(":
+            return _anything if text == "_" else _capture(text)
+        if text not in _CONSTRUCTORS:
+            raise ValueError(f"Unknown pattern {text!r} in {self.source!r}")
+        self.position += 1
+        subpatterns = []
+        if self.peek() != ")":
+            subpatterns.append(self.alternatives())
+            while self.peek() == ",":
+                self.position += 1
+                subpatterns.append(self.alternatives())
+        self.expect(")")
+        return _CONSTRUCTORS[text](subpatterns)
@@ -0,0 +1,82 @@
+"""
+Timing the phases of a render.
+
+>>> profile = Profile()
+>>> html = fnl.html(source, extensions, profile=profile)
+>>> profile.phases
+{'parse': 0.0012, 'evaluate': 0.0004, 'render': 0.0007}
+
+Phases can be nested (e.g. a template rendered during serialization); the
+time of a phase doesn't include the time of the phases inside it, so the
+times add up to the total.
+"""
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List
+from . import entities as e
+
+
+@dataclass
+class Profile:
+    phases: Dict[str, float] = field(default_factory=dict)  # name -> seconds
+    nodes: int = 0  # evaluated entities
+    output_bytes: int = 0  # the size of the HTML in UTF-8
+    disk_cache_hits: int = 0  # pages returned from the disk cache, see `fnl.disk_cache`
+    # time spent in the nested phases, for each phase being timed
+    _nested: List[float] = field(default_factory=list, repr=False, compare=False)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            self.phases[name] = self.phases.get(name, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def count_output(self, text: str):
+        """Add the size of `text` in UTF-8 to `output_bytes`"""
+        # most pages are ASCII, which is checked without encoding them
+        self.output_bytes += len(text) if text.isascii() else len(text.encode("utf-8"))
+
+    def add_time(self, other: "Profile"):
+        """Add the time spent in the phases of `other`, e.g. an earlier render of the same page"""
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def as_json(self) -> Dict[str, Any]:
+        return {
+            "phases": dict(self.phases),
+            "total": self.total,
+            "nodes": self.nodes,
+            "output_bytes": self.output_bytes,
+            "disk_cache_hits": self.disk_cache_hits,
+        }
+
+
+def count_nodes(entity: e.Entity) -> int:
+    """Count the entities in an (evaluated) tree"""
+    count = 0
+    stack = [entity]
+    while stack:
+        entity = stack.pop()
+        count += 1
+        if isinstance(entity, (e.InlineTag, e.BlockTag, e.InlineConcat, e.BlockConcat)):
+            stack.extend(entity.children)
+        elif isinstance(entity, e.AfterRender):
+            stack.append(entity.subexpr)
+        elif isinstance(entity, e.Sexpr):
+            stack.append(entity.fn)
+            stack.extend(entity.args)
+        elif isinstance(entity, e.Quoted):
+            stack.append(entity.subexpression)
+    return count
@@ -0,0 +1,104 @@
+"""
+In-memory cache of rendered HTML fragments.
+
+Site chrome (navigation blocks, footers, snippets) is the same on every page
+and every request. `RenderCache` maps the structural fingerprint of an
+evaluated subtree to its rendered text, so those subtrees are only rendered
+once.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from . import entities as e
+from .fingerprint import Fingerprinter
+
+
+class RenderCache:
+    """
+    Bounded LRU cache from evaluated entities to rendered HTML text.
+
+    - `max_chars` bounds the total length of the cached text, in characters
+    - subtrees with fewer than `min_nodes` entities aren't worth caching
+    - subtrees with an entity for which `exclude` returns True (and
+      subtrees with entity types unknown to `fnl.fingerprint`) are never
+      cached
+
+    >>> cache = RenderCache()
+    >>> html = fnl.html(source, extensions, cache=cache)
+    """
+    def __init__(
+            self,
+            max_chars: int = 16 * 1024 * 1024,
+            min_nodes: int = 8,
+            exclude: Optional[Callable[[e.Entity], bool]] = None,
+    ):
+        self.max_chars = max_chars
+        self.min_nodes = min_nodes
+        self.exclude = exclude
+        self.total_chars = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[str]:
+        if (text := self._entries.get(key)) is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: bytes, text: str):
+        size = len(text)
+        if size > self.max_chars:
+            return
+        if key in self._entries:
+            self.total_chars -= len(self._entries.pop(key))
+        self._entries[key] = text
+        self.total_chars += size
+        while self.total_chars > self.max_chars:
+            (_, evicted) = self._entries.popitem(last=False)
+            self.total_chars -= len(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.total_chars = 0
+
+    def render(self, entity: e.Entity, runtime: Dict[str, e.Entity]) -> e.HtmlRender:
+        """Render an evaluated entity, reusing the cached fragments"""
+        return _CachedRenderer(self, runtime).render(entity)
+
+
+class _CachedRenderer:
+    def __init__(self, cache: RenderCache, runtime: Dict[str, e.Entity]):
+        self.cache = cache
+        self.runtime = runtime
+        self.fingerprinter = Fingerprinter(cache.exclude)
+
+    def render(self, entity: e.Entity) -> e.HtmlRender:
+        (key, size) = self.fingerprinter.fingerprint_and_size(entity)
+        if key is None or size < self.cache.min_nodes:
+            return self._render_children(entity)
+
+        if (text := self.cache.get(key)) is None:
+            text = self._render_children(entity).as_text()
+            self.cache.put(key, text)
+        return e.RawHtml(text)
+
+    def _render_children(self, entity: e.Entity) -> e.HtmlRender:
+        # Only the containers are taken apart, so that their children can be
+        # looked up in the cache as well. Everything else (including
+        # `AfterRender`, whose text is transformed) is rendered as a whole.
+        if isinstance(entity, (e.InlineTag, e.BlockTag)):
+            render: e.HtmlRender = e.HtmlTag(
+                entity.tag, entity.options, [self.render(c) for c in entity.children]
+            )
+        elif isinstance(entity, (e.InlineConcat, e.BlockConcat)):
+            render = e.Concat([self.render(c) for c in entity.children])
+        else:
+            return e.EntityRender(entity, self.runtime)
+        if isinstance(entity, (e.InlineTag, e.InlineConcat)):
+            return e.InlineRender(render)
+        return render
@@ -1,4 +1,7 @@
+from functools import lru_cache
+from typing import Optional
 from . import entity_types as et
+from .builtin_types import BUILTIN_TYPES
 from lark import Lark, v_args, Transformer
 
 
@@ -13,6 +16,7 @@ class TypeTransformer(Transformer):
             "int": et.TInt,
             "inline": et.TInline,
             "block": et.TBlock,
+            "list": et.TList,
         }[str(token)]()
 
     @staticmethod
@@ -43,18 +47,30 @@ class TypeTransformer(Transformer):
         return et.TFunction(tuple(required_types), rest_type, return_type)  # type: ignore
 
 
-parser = Lark.open(
-    "types.lark",
-    rel_to=__file__,
-    parser="lalr",
-    transformer=TypeTransformer(),
-    propagate_positions=True,
-    maybe_placeholders=True,
-)
+_parser: Optional[Lark] = None
 
 
+def get_parser() -> Lark:
+    """Get the Lark parser for types, building it on first use"""
+    global _parser
+    if _parser is None:
+        _parser = Lark.open(
+            "types.lark",
+            rel_to=__file__,
+            parser="lalr",
+            transformer=TypeTransformer(),
+            propagate_positions=True,
+            maybe_placeholders=True,
+        )
+    return _parser
+
+
+@lru_cache(maxsize=None)
 def parse(source: str) -> et.EntityType:
-    return parser.parse(source)  # type: ignore
+    # Types are immutable, so the parsed types can be shared
+    if source in BUILTIN_TYPES:
+        return BUILTIN_TYPES[source]
+    return get_parser().parse(source)  # type: ignore
 
 
 def parse_fn(source: str) -> et.TFunction:
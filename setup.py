@@ -20,8 +20,14 @@ setuptools.setup(
     ],
     install_requires=[
         "lark",
-        "context-manager-patma@git+https://github.com/decorator-factory/context_manager_patma#egg=context-manager-patma"
     ],
+    extras_require={
+        # only for `fnl.patma_utils`, fnl itself matches with `fnl.patterns`
+        "patma": [
+            "context-manager-patma@git+https://github.com/decorator-factory/"
+            "context_manager_patma#egg=context-manager-patma"
+        ],
+    },
     python_requires='>=3.8',
     package_data={
         "": ["*.md", "*.lark", "*.html", "*.css", "*.fnl"]
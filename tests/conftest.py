@@ -0,0 +1,31 @@
+import threading
+import pytest
+import fnl
+from fnl.definitions import fn
+
+
+@pytest.fixture
+def value_extension():
+    """Make an extension with a `val` function that returns a captured value"""
+    def _value_extension(value):
+        extensions = {}
+
+        @fn(extensions, "val")
+        def val():
+            def _val():
+                return fnl.e.String(value)
+            yield ("(λ . inline)", _val)
+
+        return extensions
+    return _value_extension
+
+
+class _Locked(fnl.e.Entity):
+    """An entity whose state (a lock) can't be fingerprinted"""
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+@pytest.fixture
+def locked_entity():
+    return _Locked()
@@ -1,4 +1,10 @@
+import contextvars
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import pytest
 import fnl
+from fnl.bindings import SCOPE_KEY, _frames
 
 
 def test_let_multibinding():
@@ -44,4 +50,186 @@ def test_let_single_binding():
             fnl.bindings()
         )
         == "foobarbazfoo"
-    )
\ No newline at end of file
+    )
+
+
+def test_bindings_share_functions_but_not_scope():
+    first, second = fnl.bindings(), fnl.bindings()
+    assert first["let"] is second["let"]
+    assert first[SCOPE_KEY] is not second[SCOPE_KEY]
+
+
+def test_nested_foreach():
+    assert (
+        fnl.html(
+            '(foreach &i &(1 2) &(foreach &j &("a" "b") &($ (var &i) (var &j) " ")))',
+            fnl.bindings()
+        )
+        == "1a 1b 2a 2b "
+    )
+
+
+def test_foreach_shadows_let():
+    assert (
+        fnl.html('(let &x "outer" &($ (foreach &x &("a" "b") &(var &x)) (var &x)))', fnl.bindings())
+        == "abouter"
+    )
+
+
+def test_escaped_quoted_expression_is_looked_up_by_name():
+    # the body of `bind` is evaluated by `unquote`, in a frame the `let` can't see
+    assert (
+        fnl.html('(let &x "o" &($ (unquote (bind &x "b" &(var &x))) (var &x)))', fnl.bindings())
+        == "bo"
+    )
+
+
+def test_vars_are_resolved_to_slots():
+    from fnl.bindings import Slot, analyze_body
+    source = '($ (var &x) (let &y 1 &($ (var &x) (var &y) (var &z))))'
+    body = analyze_body(("x",), fnl.parse(source))
+    (direct, nested) = body.args
+    assert direct == Slot(0, 0, "x", direct.original)
+    (_, _, quoted_body) = nested.args
+    (from_outer, from_inner, unbound) = quoted_body.subexpression.body.args
+    assert (from_outer.depth, from_inner.depth) == (1, 0)
+    assert not isinstance(unbound, Slot)
+
+
+def _peak_memory_of_streaming(length: int) -> int:
+    source = "(foreach &i &(" + " ".join(map(str, range(length))) + ') &(p "item " (var &i)))'
+    tree = fnl.parse(source)
+    tracemalloc.start()
+    try:
+        for _chunk in fnl.iter_html(tree, fnl.bindings()):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_foreach_streams_elements():
+    _peak_memory_of_streaming(10)  # warm up
+    # the evaluated elements alone would take about 15 MiB
+    assert _peak_memory_of_streaming(20_000) < 1024 * 1024
+
+
+def test_foreach_error_while_streaming():
+    with pytest.raises(fnl.FnlTypeError):
+        fnl.html('(foreach &i &(1 2) &(var &j))', fnl.bindings())
+
+
+def test_foreach_of_blocks_is_not_inline():
+    from fnl.render_cache import RenderCache
+    renders = [
+        lambda source: fnl.html(source, fnl.bindings()),
+        lambda source: fnl.html(source, fnl.bindings(), cache=RenderCache(min_nodes=1)),
+        lambda source: "".join(fnl.iter_html(source, fnl.bindings())),
+    ]
+    error = r"Cannot call \(λ +\.\.\.inline \. inline\) with \(block\)"
+    for render in renders:
+        for source in [
+            '(bf (foreach &i &("a" "b") &(p "x")))',
+            '(tt (foreach &i &(1 2) &(p (var &i))))',
+        ]:
+            with pytest.raises(fnl.FnlTypeError, match=error):
+                render(source)
+        assert render('(bf (foreach &i &(1 2) &(var &i)))') == "<b>12</b>"
+        assert render('(p (foreach &i &(1 2) &(p (var &i))))') == "<p><p>1</p><p>2</p></p>"
+
+
+def _counting_extension():
+    calls = []
+
+    def _expensive():
+        calls.append(None)
+        return fnl.e.String("value")
+    function = fnl.e.Function({fnl.et.TFunction((), None, fnl.et.TStr()): _expensive})
+    return {**fnl.bindings(), "expensive": function}, calls
+
+
+def test_unused_binding_is_not_evaluated():
+    (runtime, calls) = _counting_extension()
+    assert fnl.html('((let &(x (expensive)) &(y "used")) &(var &y))', runtime) == "used"
+    assert calls == []
+
+
+def test_binding_is_evaluated_once():
+    (runtime, calls) = _counting_extension()
+    assert (
+        fnl.html('((let &(x (expensive))) &($ (var &x) (foreach &i &(1 2) &(var &x))))', runtime)
+        == "valuevaluevalue"
+    )
+    assert len(calls) == 1
+
+
+def test_binding_is_evaluated_where_it_is_bound():
+    assert (
+        fnl.html(
+            '((let &(x "outer")) &((let &(y (var &x))) &(let &x "inner" &(var &y))))',
+            fnl.bindings()
+        )
+        == "outer"
+    )
+
+
+def test_bind_expands_to_lazy_let():
+    runtime = fnl.bindings()
+    quoted = fnl.parse('(bind &x "b" &(var &x))').evaluate({**fnl.definitions.BUILTINS, **runtime})
+    assert quoted == fnl.e.Quoted(fnl.e.Sexpr(
+        fnl.e.Sexpr(runtime["let"], (fnl.parse('&(x "b")'),)),
+        (fnl.parse("&(var &x)"),),
+    ))
+
+
+def test_shared_runtime_in_many_threads():
+    runtime = fnl.bindings()
+    pages = [
+        (
+            f'((let &(n "{n}")) &(foreach &i &(1 2 3) &($ '
+            '(var &n) (let &n "-" &(var &n)) (var &i))))',
+            f"{n}-1{n}-2{n}-3",
+        )
+        for n in range(20)
+    ]
+
+    def render(k: int):
+        (source, expected) = pages[k % len(pages)]
+        if k % 7 == 0:
+            # an error in the middle of a scope doesn't leave the scope behind
+            with pytest.raises(fnl.FnlTypeError):
+                fnl.html('(let &n "leaked" &(var &missing))', runtime)
+            with pytest.raises(fnl.FnlTypeError):
+                fnl.html('(var &n)', runtime)
+        return fnl.html(source, runtime) == expected
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads in the middle of the renders
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            assert all(executor.map(render, range(2_000)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def test_scopes_are_not_kept_in_the_context():
+    source = '(let &x "a" &(foreach &i &(1 2) &(var &x)))'
+    fnl.html(source, fnl.bindings())
+    size = len(contextvars.copy_context())
+    for _ in range(100):
+        assert fnl.html(source, fnl.bindings()) == "aa"
+    assert len(contextvars.copy_context()) == size
+    assert _frames.get() == {}
+
+
+def test_foreach_list():
+    assert (
+        fnl.html(
+            """
+            (let &x "-" &(foreach &i (range 1 4) &($ (var &i) (var &x))))
+            """,
+            fnl.bindings()
+        )
+        == "1-2-3-"
+    )
+    assert fnl.html('(foreach &i (list "a" (bf "b")) &(var &i))', fnl.bindings()) == "a<b>b</b>"
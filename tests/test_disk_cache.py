@@ -0,0 +1,90 @@
+import multiprocessing
+import fnl
+import fnl.entities as e
+from fnl.definitions import fn
+from fnl.disk_cache import DiskCache
+
+
+# A global: the values captured by an extension are part of the key
+_calls = []
+
+
+def _counting_extension():
+    extensions = {}
+
+    @fn(extensions, "counted")
+    def counted():
+        def _counted():
+            _calls.append(1)
+            return e.String("counted")
+        yield ("(λ . inline)", _counted)
+
+    _calls.clear()
+    return extensions, _calls
+
+
+def test_hit_skips_evaluation(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    extensions, calls = _counting_extension()
+    source = '(p (bf "a") (counted))'
+    expected = fnl.html(source, extensions)
+    calls.clear()
+
+    assert fnl.html(source, extensions, disk_cache=cache) == expected
+    assert fnl.html(source, extensions, disk_cache=cache) == expected
+    assert len(calls) == 1
+
+    # a new connection, as in another process
+    assert fnl.html(source, extensions, disk_cache=DiskCache(cache.path)) == expected
+    assert len(calls) == 1
+
+    assert fnl.html(source, {**extensions, "x": e.String("y")}, disk_cache=cache) == expected
+    assert len(calls) == 2
+
+
+def test_captured_values_are_part_of_the_key(tmp_path, value_extension):
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    assert fnl.html('(p (val))', value_extension("A"), disk_cache=cache) == "<p>A</p>"
+    assert fnl.html('(p (val))', value_extension("B"), disk_cache=cache) == "<p>B</p>"
+    assert fnl.html('(p (val))', value_extension("A"), disk_cache=cache) == "<p>A</p>"
+    assert len(cache) == 2
+
+
+def test_unknown_values_are_not_cached(tmp_path, locked_entity):
+    cache = DiskCache(tmp_path / "cache.sqlite3")
+    extensions = {"$locked": locked_entity}
+    assert cache.key('(p "a")', extensions) is None
+    assert fnl.html('(p "a")', extensions, disk_cache=cache) == "<p>a</p>"
+    assert len(cache) == 0
+
+
+def test_eviction_by_size(tmp_path):
+    cache = DiskCache(tmp_path / "cache.sqlite3", max_bytes=1000)
+    for i in range(100):
+        cache.put(i.to_bytes(2, "little"), "x" * 100)
+    assert cache.total_bytes <= 1000
+    assert len(cache) == 10
+    assert cache.get((99).to_bytes(2, "little")) == "x" * 100
+    assert cache.get((0).to_bytes(2, "little")) is None
+
+
+def _write_many(path, worker):
+    cache = DiskCache(path, max_bytes=50_000)
+    for i in range(200):
+        key = f"{worker}-{i}".encode()
+        cache.put(key, key.decode() * 10)
+        assert cache.get(key) in (None, key.decode() * 10)
+
+
+def test_concurrent_processes(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    DiskCache(path)
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_write_many, args=(path, worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert 0 < len(DiskCache(path)) <= 800
+    assert DiskCache(path).total_bytes <= 50_000
@@ -0,0 +1,173 @@
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+import fnl
+from fnl.docs import build
+from fnl.docs.highlight import highlight
+from fnl.docs.manifest import Manifest
+from fnl.docs.watch import WatchDaemon, poll_changes
+
+
+PAGES = {
+    "a.fnl": '($docs $filename $source "Page A" (p "See " ($link-to "b.html")))',
+    "b.fnl": '($docs $filename $source "Page B" (p ($fnl "(bf 1)")))',
+}
+
+
+def _write_sources(src_dir):
+    src_dir.mkdir()
+    for (name, source) in PAGES.items():
+        (src_dir / name).write_text(source)
+    return src_dir
+
+
+def _outputs(html_dir):
+    return {path.name: path.read_text() for path in html_dir.glob("*.html")}
+
+
+def _fresh_build(src_dir, html_dir):
+    html_dir.mkdir()
+    build.build(src_dir, html_dir)
+    return html_dir
+
+
+def _render(template: build.CompiledTemplate, parts) -> str:
+    pieces = [template.chunks[0].as_text()]
+    for (slot, chunk) in zip(template.slots, template.chunks[1:]):
+        pieces.append(parts[slot])
+        pieces.append(chunk.as_text())
+    return "".join(pieces)
+
+
+def test_compiled_template_matches_string_template():
+    text = "<p>$title</p><a href='$$x'>${mount}s</a>\n$title"
+    parts = {"title": "T", "mount": "<b>M</b>"}
+    compiled = build.CompiledTemplate.compile(text)
+    assert _render(compiled, parts) == string.Template(text).substitute(parts)
+
+
+def test_page_matches_string_template():
+    page = build.compile_source(PAGES["b.fnl"], "b.html", {})
+    without_live_reload = "".join(
+        line for line in build.template_html.splitlines(keepends=True)
+        if "$livereload" not in line
+    )
+    assert page.html == string.Template(without_live_reload).substitute(
+        title="Page B",
+        mount=fnl.html('(p ($fnl "(bf 1)"))', build.runtime_extensions()),
+    )
+    assert page.entry == ("Page B", PAGES["b.fnl"])
+
+
+def _metadata(source: str, filename: str = "a.html"):
+    return build.read_metadata(source, filename, fnl.parse(source))
+
+
+def test_read_metadata():
+    assert _metadata(PAGES["a.fnl"]) == ("Page A", PAGES["a.fnl"])
+    # the header is evaluated, the body isn't
+    source = '($docs $filename $source (tt "Page") (var &undefined))'
+    assert _metadata(source) is None
+    source = '($docs $filename $source "Page" (var &undefined))'
+    assert _metadata(source) == ("Page", source)
+    assert _metadata(PAGES["a.fnl"], "b.html") == ("Page A", PAGES["a.fnl"])
+    # a page that isn't a `$docs` call, or names another file
+    assert _metadata('(p "no header")') is None
+    assert _metadata('($docs "c.html" $source "Page C" (p))') is None
+
+
+def test_highlight():
+    assert fnl.e.EntityRender(highlight('(bf "a<b")  ; note\n&x'), {}).as_text() == (
+        '<span class="code--fnl--sexpr">'
+        '<span class="code--fnl--left-paren">(</span>'
+        '<span class="code--fnl--name">bf</span>'
+        '<span class="code--fnl--ws"> </span>'
+        '<span class="code--fnl--string">&quot;a&lt;b&quot;</span>'
+        '<span class="code--fnl--rpar">)</span>'
+        '</span>'
+        '<span class="code--fnl--ws">  ; note\n</span>'
+        '<span class="code--fnl--ampersand">&amp;</span>'
+        '<span class="code--fnl--name">x</span>'
+    )
+
+
+def test_highlight_in_nobr():
+    # the text of the tokens goes through the transform of `nobr`
+    html = fnl.html('(nobr ($fnl "(bf 1)"))', build.extensions)
+    assert '<span class="code--fnl--ws">&nbsp;</span>' in html
+
+
+def test_parallel_build_matches_serial_build(tmp_path):
+    src_dir = _write_sources(tmp_path / "src")
+    (tmp_path / "serial").mkdir()
+    (tmp_path / "parallel").mkdir()
+    serial = build.build(src_dir, tmp_path / "serial", jobs=1)
+    parallel = build.build(src_dir, tmp_path / "parallel", jobs=2)
+    assert [page.filename for page in parallel] == [page.filename for page in serial]
+    assert _outputs(tmp_path / "parallel") == _outputs(tmp_path / "serial")
+    assert 'href="b.html">Page B</a>' in _outputs(tmp_path / "serial")["a.html"]
+
+
+def test_parallel_build_with_late_pages(tmp_path):
+    # `c.html` adds itself to the store only while it's rendered, so the
+    # pages that link to it are compiled again
+    src_dir = _write_sources(tmp_path / "src")
+    (src_dir / "c.fnl").write_text('($ ($docs $filename $source "Page C" (p "x")))')
+    (src_dir / "d.fnl").write_text('($docs $filename $source "Page D" ($link-to "c.html"))')
+    (tmp_path / "serial").mkdir()
+    (tmp_path / "parallel").mkdir()
+    build.build(src_dir, tmp_path / "serial", jobs=1)
+    build.build(src_dir, tmp_path / "parallel", jobs=2)
+    assert _outputs(tmp_path / "parallel") == _outputs(tmp_path / "serial")
+    assert 'href="c.html">Page C</a>' in _outputs(tmp_path / "serial")["d.html"]
+
+
+def test_unchanged_pages_are_skipped(tmp_path):
+    src_dir = _write_sources(tmp_path / "src")
+    html_dir = tmp_path / "html"
+    html_dir.mkdir()
+    assert [page.filename for page in build.build(src_dir, html_dir)] == ["a.html", "b.html"]
+    assert build.build(src_dir, html_dir) == []
+
+    # a.html links to b.html, so it has to show the new title
+    (src_dir / "b.fnl").write_text(PAGES["b.fnl"].replace("Page B", "Page Bee"))
+    assert [page.filename for page in build.build(src_dir, html_dir)] == ["a.html", "b.html"]
+    assert 'href="b.html">Page Bee</a>' in (html_dir / "a.html").read_text()
+
+    (src_dir / "a.fnl").write_text(PAGES["a.fnl"] + " ")
+    assert [page.filename for page in build.build(src_dir, html_dir)] == ["a.html"]
+
+    (html_dir / "b.html").unlink()
+    assert "b.html" in [page.filename for page in build.build(src_dir, html_dir)]
+    assert (html_dir / "b.html").exists()
+
+
+def test_watch_rebuilds_dependents(tmp_path):
+    src_dir = _write_sources(tmp_path / "src")
+    html_dir = tmp_path / "html"
+    html_dir.mkdir()
+    build.build(src_dir, html_dir)
+    daemon = WatchDaemon(src_dir, html_dir)
+
+    (src_dir / "b.fnl").write_text(PAGES["b.fnl"].replace("Page B", "Page Bee"))
+    pages = daemon.rebuild({src_dir / "b.fnl"})
+    assert sorted(page.filename for page in pages) == ["a.html", "b.html"]
+    assert 'href="b.html">Page Bee</a>' in (html_dir / "a.html").read_text()
+    assert _outputs(html_dir) == _outputs(_fresh_build(src_dir, tmp_path / "fresh"))
+
+    # nothing changed
+    assert daemon.rebuild({src_dir / "b.fnl"}) == []
+
+    (src_dir / "b.fnl").unlink()
+    assert [page.filename for page in daemon.rebuild({src_dir / "b.fnl"})] == ["a.html"]
+    assert "b.fnl" not in Manifest.load(html_dir).pages
+
+
+def test_poll_changes(tmp_path):
+    src_dir = _write_sources(tmp_path / "src")
+    changes = poll_changes(src_dir, interval=0.01, debounce=0.01)
+    with ThreadPoolExecutor(1) as executor:
+        first_changes = executor.submit(next, changes)
+        time.sleep(0.1)
+        (src_dir / "c.fnl").write_text('(p "c")')
+        assert first_changes.result(timeout=10) == {src_dir / "c.fnl"}
@@ -65,3 +65,50 @@ def test_sexpr():
     )
 
     assert sexpr.evaluate(runtime) == e.Integer(9)
+
+
+def test_deep_render_tree():
+    tree = e.RawHtml("x")
+    for _ in range(10_000):
+        tree = e.HtmlTag("b", "", [tree])
+    assert tree.as_text() == "<b>" * 10_000 + "x" + "</b>" * 10_000
+
+
+def test_text_transform_composition():
+    upper = e.TextTransform({"a": "A", "b": "B"})
+    wrap = e.TextTransform({"A": "[A]", " ": "_"})
+    text = "a b c"
+    assert upper.then(wrap)(text) == wrap(upper(text)) == "[A]_B_c"
+    assert upper.then(wrap) is upper.then(wrap)
+    assert e.ESCAPE("<a href='x'>&\"</a>") == "&lt;a href=&#x27;x&#x27;&gt;&amp;&quot;&lt;/a&gt;"
+    assert e.ESCAPE.then(e.IDENTITY) is e.ESCAPE
+    assert e.TextTransform({"a": "b", "b": "a"})("abba") == "baab"
+
+
+def test_text_transform_compositions_are_bounded():
+    for i in range(5000):
+        e.ESCAPE.then(e.TextTransform({chr(0x100 + i): "x"}))
+    assert e._compose.cache_info().currsize <= e._compose.cache_info().maxsize
+
+
+def test_rope_concatenation():
+    rope = e.RawHtml("")
+    for i in range(10_000):
+        rope = rope + e.SafeHtml(f"<{i}>")
+    assert rope.as_text() == "".join(f"&lt;{i}&gt;" for i in range(10_000))
+    tag = e.HtmlTag("p", "", [e.RawHtml("a")]).with_appended(e.RawHtml("b"))
+    assert tag.as_text() == "<p>ab</p>"
+    assert bytes(tag.utf8_chunks(1).__next__()) == b"<p>"
+
+
+def test_entity_render_matches_html_render_tree():
+    import fnl
+    source = """
+        ($ ((h 1) "a < b") (p "x " 42 (--) (nobr (it "y z")) (horizontal-rule))
+           (list-ordered (mono "m n") ((style "color: red") "r")))
+    """
+    runtime = {**fnl.definitions.BUILTINS}
+    expr = fnl.parse(source).evaluate(runtime)
+    fused = e.EntityRender(expr, runtime)
+    assert fused.as_text() == expr.render(runtime).as_text()
+    assert bytes(fused.utf8_chunks(10**6).__next__()) == fused.as_text().encode()
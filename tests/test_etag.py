@@ -0,0 +1,39 @@
+import hashlib
+import io
+import fnl
+from fnl.etag import ETagStream, content_etag, input_etag
+
+
+SOURCE = '($ ((h 1) "Ünïcode") (p "text" (nobr (it "a b"))))'
+
+
+def test_streamed_etag_matches_content_etag():
+    stream = ETagStream(fnl.iter_html_utf8(SOURCE, chunk_size=4))
+    body = b"".join(stream)
+    assert body == fnl.html(SOURCE).encode("utf-8")
+    assert stream.etag == content_etag(body)
+
+
+def test_render_to_hasher():
+    for output in (io.StringIO(), io.BytesIO()):
+        hasher = hashlib.sha256()
+        fnl.render_to(SOURCE, output, hasher=hasher)
+        assert hasher.hexdigest() == hashlib.sha256(fnl.html_utf8(SOURCE)).hexdigest()
+
+
+def test_input_etag():
+    extensions = {"$title": fnl.e.String("Title")}
+    assert input_etag(SOURCE, extensions) == input_etag(SOURCE, dict(extensions))
+    assert input_etag(SOURCE, extensions) != input_etag(SOURCE + " ", extensions)
+    assert input_etag(SOURCE, extensions) != input_etag(SOURCE, {"$title": fnl.e.String("Other")})
+    assert input_etag(SOURCE, extensions) != input_etag(SOURCE, extensions, salt=b"v2")
+
+
+def test_input_etag_of_captured_values(value_extension):
+    source = '(p (val))'
+    assert input_etag(source, value_extension("A")) == input_etag(source, value_extension("A"))
+    assert input_etag(source, value_extension("A")) != input_etag(source, value_extension("B"))
+
+
+def test_no_input_etag_for_unknown_values(locked_entity):
+    assert input_etag(SOURCE, {"$locked": locked_entity}) is None
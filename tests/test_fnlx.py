@@ -1,3 +1,4 @@
+import pytest
 import fnl
 
 
@@ -78,3 +79,28 @@ def test_closed_tag():
 def test_stringly_tag_name():
     assert fnl.html('(b"!DOCTYPE" &html &/)', fnl.x) == "<!DOCTYPE html />"
     assert fnl.html('(i"!DOCTYPE" &html &/)', fnl.x) == "<!DOCTYPE html />"
+
+
+def test_repeated_options():
+    source = '(b&div &.a &#x (i&span &.a &#x "1") (i&span &.a &#x "2"))'
+    expected = (
+        '<div class="a" id="x">'
+        '<span class="a" id="x">1</span><span class="a" id="x">2</span>'
+        '</div>'
+    )
+    assert fnl.html(source, fnl.x) == expected
+    assert fnl.html(source, fnl.x) == expected
+
+
+def test_call_style_options_are_cached():
+    # the options are equal wherever they are in the source
+    source = '(b&div &(data-kind "note") (i&span &(data-kind "note") "x"))'
+    fnl.html(source, fnl.x)
+    hits = fnl.fnlx._parse_options.cache_info().hits
+    fnl.html("\n" + source, fnl.x)
+    assert fnl.fnlx._parse_options.cache_info().hits == hits + 2
+
+
+def test_bad_option():
+    with pytest.raises(TypeError):
+        fnl.html('(b&div &(a "b" "c") "x")', fnl.x)
@@ -0,0 +1,47 @@
+import fnl
+import fnl.entities as e
+from fnl.definitions import BUILTINS
+from fnl.html_diff import Patch, diff
+
+
+def _tree(source: str) -> e.HtmlRender:
+    return e.EntityRender(fnl.parse(source).evaluate(BUILTINS), BUILTINS)
+
+
+def test_no_changes():
+    source = '($ (p "a" (bf "b")) (p "c"))'
+    assert diff(_tree(source), _tree(source)) == []
+
+
+def test_nested_change():
+    old = _tree('($ (p "a") (p "b" (bf "c") (it "d")))')
+    new = _tree('($ (p "a") (p "b" (bf "c") (it "e & f")))')
+    assert diff(old, new) == [Patch((1, 1), "e &amp; f")]
+
+
+def test_changed_shape_replaces_parent():
+    old = _tree('($ (p "a") (p "b" (bf "c")))')
+    new = _tree('($ (p "a") (p "b" (bf "c") (it "d")))')
+    assert diff(old, new) == [Patch((1,), "b<b>c</b><i>d</i>")]
+
+    old = _tree('($ (p "a") (p "b"))')
+    new = _tree('($ (p "a") "text")')
+    assert diff(old, new) == [Patch((), fnl.html('($ (p "a") "text")'))]
+
+
+def test_raw_html_is_opaque():
+    old = _tree('(p (e "mdash") (bf "a"))')
+    new = _tree('(p (e "mdash") (bf "b"))')
+    assert diff(old, new) == [Patch((0,), "&mdash;<b>b</b>")]
+
+
+def test_closed_tags_are_counted():
+    old = _tree('($ (horizontal-rule) (p "a"))')
+    new = _tree('($ (horizontal-rule) (p "b"))')
+    assert diff(old, new) == [Patch((1,), "b")]
+
+
+def test_transforms_are_applied():
+    old = _tree('(p (nobr (it "a b")) (bf "x"))')
+    new = _tree('(p (nobr (it "a c")) (bf "x"))')
+    assert diff(old, new) == [Patch((0, 0), "a&nbsp;c")]
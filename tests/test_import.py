@@ -0,0 +1,59 @@
+import subprocess
+import sys
+
+
+# Building the Lark grammars, parsing the built-in types or loading the rarely
+# used parts of `fnl` at import time would make every `import fnl` slow
+LAZY_MODULES = [
+    "fnl.fnlx", "fnl.docs", "fnl.patma_utils", "fnl.fingerprint", "fnl.render_cache",
+    "fnl.etag", "fnl.html_diff", "fnl.profile", "fnl.disk_cache",
+    "context_manager_patma", "sqlite3", "socket",
+]
+
+
+_SCRIPT = """
+import sys
+import fnl
+
+print(fnl._parser is None and fnl.type_parser._parser is None)
+print(" ".join(sorted(sys.modules)))
+"""
+
+
+def _cold_import():
+    output = subprocess.run(
+        [sys.executable, "-c", _SCRIPT],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.splitlines()
+    return output[0] == "True", set(output[1].split())
+
+
+def test_import_is_lazy():
+    parsers_are_lazy, modules = _cold_import()
+    assert parsers_are_lazy
+    assert modules.isdisjoint(LAZY_MODULES)
+
+
+def test_bindings_function():
+    # importing the submodule must not replace the function
+    script = "import fnl.bindings; print(callable(fnl.bindings), 'let' in fnl.bindings())"
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert output.split() == ["True", "True"]
+
+
+def test_extensions_use_prebuilt_types():
+    script = "import fnl; fnl.bindings(); fnl.x; print(fnl.type_parser._parser is None)"
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert output.split() == ["True"]
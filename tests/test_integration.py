@@ -1,3 +1,5 @@
+import pytest
+import fnl
 from fnl import html
 
 
@@ -91,4 +93,48 @@ def test_readme_example():
             '<li><b>super</b> awesome</li>'
             '<li><span style="color: red; font-size: 100%">amazing</span></li>'
         '</ul>'
-    )
\ No newline at end of file
+    )
+
+
+def test_nobr_inside_inline_element():
+    assert html('(bf (mono "a b") " c")') == '<b><tt>a&nbsp;b</tt> c</b>'
+
+
+def test_nested_nobr():
+    assert html('(nobr (p "a b" (nobr (bf "c d <e>"))))') == (
+        '<p>a&nbsp;b<b>c&nbsp;d&nbsp;&lt;e&gt;</b></p>'
+    )
+
+
+def test_render_parsed_source():
+    tree = fnl.parse('(p "a" var)')
+    assert html(tree, {"var": fnl.e.String("b")}) == '<p>ab</p>'
+    assert html(tree, {"var": fnl.e.String("c")}) == '<p>ac</p>'
+
+
+def test_list_length_and_index():
+    assert html('(length (list "a" (bf "b") "c"))') == "3"
+    assert html('(index (list "a" (bf "b") "c") 1)') == "<b>b</b>"
+    assert html('(index (list "a" "b" "c") -1)') == "c"
+
+
+def test_range():
+    assert html('(length (range 1000000000))') == "1000000000"
+    assert html('(index (range 10 20) 5)') == "15"
+    assert html('((map bf) (slice (range 10) 2 5))') == "<b>2</b><b>3</b><b>4</b>"
+
+
+def test_map_list():
+    assert html('((map bf) (list "a" "b"))') == html('((map bf) "a" "b")')
+    assert html('((map p) (list "a" (bf "b")))') == "<p>a</p><p><b>b</b></p>"
+
+
+def test_map_streams_a_range():
+    # would take minutes (and gigabytes) if the calls were made up front
+    chunks = fnl.iter_html('((map bf) (range 1000000000))', chunk_size=16)
+    assert next(chunks) == "<b>0</b><b>1</b>"
+
+
+def test_index_out_of_range():
+    with pytest.raises(TypeError):
+        html('(index (list "a" "b") 2)')
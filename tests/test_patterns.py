@@ -0,0 +1,39 @@
+import pytest
+import fnl
+from fnl.patterns import compile_pattern, match
+
+
+def test_let_entry():
+    m = match('Quoted(Sexpr(Name(name), expr))', fnl.parse('&(x "foo")'))
+    assert m == {"name": "x", "expr": fnl.e.String("foo")}
+    assert match('Quoted(Sexpr(Name(name), expr))', fnl.parse('&(x "foo" "bar")')) is None
+
+
+def test_cons_on_strings():
+    pattern = compile_pattern('Cons(".", class_name) | Cons("#", Cons("_", id_name))')
+    assert pattern.match(".box") == {"class_name": "box"}
+    assert pattern.match("#_main") == {"id_name": "main"}
+    assert pattern.match("#main") is None
+    assert pattern.match(".") is None
+    assert match('Cons("a", Cons("b", "cd"))', "abcd") == {}
+    assert match('Cons("a", Cons("b", "cd"))', "abce") is None
+
+
+def test_cons_on_sequences():
+    assert (
+        match('Cons(first, Cons(second, rest))', (1, 2, 3, 4))
+        == {"first": 1, "second": 2, "rest": (3, 4)}
+    )
+    call = fnl.parse("(f)")
+    assert match('Seq(a, _, Pi(c, Sexpr()))', [1, 2, call]) == {"a": 1, "c": call}
+
+
+def test_patterns_are_compiled_once():
+    assert compile_pattern('Seq(a, b)') is compile_pattern('Seq(a, b)')
+
+
+def test_invalid_pattern():
+    with pytest.raises(ValueError):
+        compile_pattern('Quoted(Name(name)')
+    with pytest.raises(ValueError):
+        compile_pattern('Unknown(x)')
@@ -0,0 +1,55 @@
+import fnl
+from fnl.disk_cache import DiskCache
+from fnl.profile import Profile, count_nodes
+from fnl.render_cache import RenderCache
+
+
+SOURCE = '($ ((h 1) "Title") (p "text" (nobr (it "a b"))))'
+
+
+def test_profiled_html():
+    profile = Profile()
+    assert fnl.html(SOURCE, profile=profile) == fnl.html(SOURCE)
+    assert set(profile.phases) == {"parse", "evaluate", "render"}
+    assert profile.nodes == count_nodes(fnl.parse(SOURCE).evaluate(fnl.definitions.BUILTINS))
+    assert profile.output_bytes == len(fnl.html(SOURCE))
+
+    fnl.html(SOURCE, cache=RenderCache(), profile=profile)
+    assert profile.output_bytes == 2 * len(fnl.html(SOURCE))
+
+
+def test_output_bytes_are_utf8():
+    profile = Profile()
+    fnl.html('(p "café ≠ cafe")', profile=profile)
+    assert profile.output_bytes == len("<p>café ≠ cafe</p>".encode("utf-8"))
+
+
+def test_disk_cache_hits_are_counted(tmp_path):
+    cache = DiskCache(tmp_path / "cache")
+    expected = fnl.html(SOURCE).encode("utf-8")
+    profile = Profile()
+    fnl.html(SOURCE, disk_cache=cache, profile=profile)
+    assert (profile.disk_cache_hits, profile.output_bytes) == (0, len(expected))
+    assert "evaluate" in profile.phases
+
+    profile = Profile()
+    fnl.html(SOURCE, disk_cache=cache, profile=profile)
+    assert (profile.disk_cache_hits, profile.output_bytes) == (1, len(expected))
+    assert set(profile.phases) == {"disk cache"}
+
+
+def test_render_phase_times_serialization():
+    # the elements of `foreach` are evaluated while they're serialized
+    source = '(foreach &i (range 20000) &(bf (var &i)))'
+    profile = Profile()
+    fnl.html(source, fnl.bindings(), profile=profile)
+    assert profile.phases["render"] > profile.phases["evaluate"]
+
+
+def test_nested_phases_are_exclusive():
+    profile = Profile()
+    with profile.phase("outer"):
+        with profile.phase("inner"):
+            sum(range(100000))
+    assert profile.phases["outer"] < profile.phases["inner"]
+    assert profile.total == profile.phases["outer"] + profile.phases["inner"]
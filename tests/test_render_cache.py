@@ -0,0 +1,38 @@
+import fnl
+import fnl.entities as e
+from fnl.render_cache import RenderCache
+
+
+NAVIGATION = '(list-unordered (a "index.html" "Index") (a "about.html" (bf "About")))'
+
+
+def test_cached_render_is_identical():
+    cache = RenderCache(min_nodes=2)
+    for body in ['"first page"', '(p "second" (it "page"))']:
+        source = f"($ {NAVIGATION} {body} (nobr (tt \"a b\")))"
+        assert fnl.html(source, cache=cache) == fnl.html(source)
+    assert cache.hits > 0
+
+
+def test_cache_hit():
+    cache = RenderCache(min_nodes=2)
+    fnl.html(NAVIGATION, cache=cache)
+    hits = cache.hits
+    fnl.html(f'($ "hello" {NAVIGATION})', cache=cache)
+    assert cache.hits > hits
+
+
+def test_eviction_by_size():
+    cache = RenderCache(max_chars=500, min_nodes=1)
+    for i in range(100):
+        cache.put(i.to_bytes(2, "little"), "x" * 50)
+    assert cache.total_chars == 500
+    assert len(cache) == 10
+    assert cache.get((99).to_bytes(2, "little")) is not None
+    assert cache.get((0).to_bytes(2, "little")) is None
+
+
+def test_excluded_subtrees_are_not_cached():
+    cache = RenderCache(min_nodes=1, exclude=lambda entity: isinstance(entity, e.InlineRaw))
+    fnl.html('(p (bf "cached") (--))', cache=cache)
+    assert len(cache) == 2  # <b>cached</b> and "cached", but not the <p>
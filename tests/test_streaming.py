@@ -0,0 +1,62 @@
+import io
+import socket
+import pytest
+import fnl
+
+
+SOURCE = '($ ((h 1) "Archive") (list-unordered "a & b" (bf "c") (it "d")))'
+
+
+def test_iter_html():
+    chunks = list(fnl.iter_html(SOURCE, chunk_size=8))
+    assert "".join(chunks) == fnl.html(SOURCE)
+    assert all(len(chunk) >= 8 for chunk in chunks[:-1])
+
+
+def test_render_to_text_file():
+    output = io.StringIO()
+    written = fnl.render_to('(bf "привет")', output, buffer_size=4)
+    assert output.getvalue() == "<b>привет</b>"
+    assert written == len("<b>привет</b>")
+
+
+def test_render_to_binary_file():
+    output = io.BytesIO()
+    written = fnl.render_to('(bf "привет")', output, buffer_size=4)
+    assert output.getvalue() == "<b>привет</b>".encode("utf-8")
+    assert written == len(output.getvalue())
+
+
+def test_render_to_socket():
+    left, right = socket.socketpair()
+    with left, right:
+        written = fnl.render_to(SOURCE, left)
+        assert right.recv(written).decode("utf-8") == fnl.html(SOURCE)
+
+
+def test_html_utf8():
+    source = '(nobr (p "привет, мир" (bf "<&>") (--) (b&hr &/)))'
+    assert fnl.html_utf8(source, fnl.x) == fnl.html(source, fnl.x).encode("utf-8")
+
+
+class _BoldParagraph(fnl.e.Entity):
+    """An extension that (wrongly) calls `bf` on a block while it's rendered"""
+    def render_inline(self, runtime):
+        call = fnl.e.Sexpr(fnl.e.Name("bf"), (fnl.e.BlockTag("p", "", ()),))
+        return call.evaluate(runtime).render_inline(runtime)
+
+
+def test_errors_while_serializing():
+    source = '(p $bold-paragraph)'
+    extensions = {"$bold-paragraph": _BoldParagraph()}
+    renders = [
+        lambda: fnl.html(source, extensions),
+        lambda: fnl.html_utf8(source, extensions),
+        lambda: list(fnl.iter_html(source, extensions)),
+        lambda: list(fnl.iter_html_utf8(source, extensions)),
+        lambda: fnl.render_to(source, io.StringIO(), extensions),
+        lambda: fnl.render_to(source, io.BytesIO(), extensions),
+    ]
+    for render in renders:
+        with pytest.raises(fnl.FnlTypeError, match="Cannot call"):
+            render()
@@ -1,4 +1,5 @@
 import fnl
+import fnl.builtin_types
 
 
 def test_primitive_types():
@@ -73,3 +74,14 @@ def test_function_type_full():
         == fnl.type_parser.parse("(^ int block ...str . int)")
         == fnl.et.TFunction((fnl.et.TInt(), fnl.et.TBlock()), fnl.et.TStr(), fnl.et.TInt())
     )
+
+
+def test_parse_is_memoized():
+    assert fnl.type_parser.parse("(λ int . str)") is fnl.type_parser.parse("(λ int . str)")
+
+
+def test_builtin_types_match_the_parser():
+    for source, prebuilt in fnl.builtin_types.BUILTIN_TYPES.items():
+        parsed = fnl.type_parser.get_parser().parse(source)
+        assert parsed == prebuilt, source
+        assert parsed.signature() == prebuilt.signature(), source